@@ -1,128 +1,165 @@
+import glob
+import hashlib
+import json
+import os
+import struct
 import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
-registers = {
-    "zero": "00000", "ra": "00001", "sp": "00010", "gp": "00011", "tp": "00100",
-    "t0": "00101", "t1": "00110", "t2": "00111", "s0": "01000", "s1": "01001",
-    "a0": "01010", "a1": "01011", "a2": "01100", "a3": "01101", "a4": "01110",
-    "a5": "01111", "a6": "10000", "a7": "10001", "s2": "10010", "s3": "10011",
-    "s4": "10100", "s5": "10101", "s6": "10110", "s7": "10111", "s8": "11000",
-    "s9": "11001", "s10": "11010", "s11": "11011", "t3": "11100", "t4": "11101",
-    "t5": "11110", "t6": "11111"
-}
+import isa
 
-instructions = {
-    "add": {"opcode": "0110011", "funct3": "000", "funct7": "0000000"},
-    "sub": {"opcode": "0110011", "funct3": "000", "funct7": "0100000"},
-    "slt": {"opcode": "0110011", "funct3": "010", "funct7": "0000000"},
-    "srl": {"opcode": "0110011", "funct3": "101", "funct7": "0000000"},
-    "or": {"opcode": "0110011", "funct3": "110", "funct7": "0000000"},
-    "addi": {"opcode": "0010011", "funct3": "000"},
-    "lw": {"opcode": "0000011", "funct3": "010"},
-    "jalr": {"opcode": "1100111", "funct3": "000"},
-    "sw": {"opcode": "0100011", "funct3": "010"},
-    "beq": {"opcode": "1100011", "funct3": "000"},
-    "bne": {"opcode": "1100011", "funct3": "001"},
-    "jal": {"opcode": "1101111"},
-    "rst": {"opcode": "1110011", "funct3": "001"},
-    "halt": {"opcode": "1110011", "funct3": "010"}
-}
+# ABI names plus their x0-x31 aliases, interned since every operand of
+# every line is looked up here
+registers = {sys.intern(name): num for name, num in isa.REGISTERS.items()}
+registers.update({sys.intern(f"x{num}"): num for num in range(32)})
+instructions = isa.ENCODINGS
+
+# Field packing. Every instruction is built as a 32-bit integer and only
+# formatted as text (or raw bytes) when it is written out.
+def pack_r(funct7, rs2, rs1, funct3, rd, opcode):
+    return (funct7 << 25) | (rs2 << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+def pack_i(imm, rs1, funct3, rd, opcode):
+    return ((imm & 0xFFF) << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+def pack_s(imm, rs2, rs1, funct3, opcode):
+    imm &= 0xFFF
+    return ((imm >> 5) << 25) | (rs2 << 20) | (rs1 << 15) | (funct3 << 12) | ((imm & 0x1F) << 7) | opcode
+
+def pack_b(imm, rs2, rs1, funct3, opcode):
+    imm &= 0x1FFF
+    return (((imm >> 12) & 0x1) << 31) | (((imm >> 5) & 0x3F) << 25) | (rs2 << 20) | (rs1 << 15) | \
+           (funct3 << 12) | (((imm >> 1) & 0xF) << 8) | (((imm >> 11) & 0x1) << 7) | opcode
+
+def pack_u(imm, rd, opcode):
+    return ((imm & 0xFFFFF) << 12) | (rd << 7) | opcode
+
+def pack_j(imm, rd, opcode):
+    imm &= 0x1FFFFF
+    return (((imm >> 20) & 0x1) << 31) | (((imm >> 1) & 0x3FF) << 21) | (((imm >> 11) & 0x1) << 20) | \
+           (((imm >> 12) & 0xFF) << 12) | (rd << 7) | opcode
+
+class AssemblerError(Exception):
+    # Raised for any error in the assembly source. str() gives the same
+    # "Error at line N: ..." text the command line prints. `code` is a short
+    # machine readable error kind and `token` the offending operand, if any.
+    # `operand` is the index of the token holding it in the line's tokens
+    # (0 is the mnemonic), used to place the diagnostic's column.
+    def __init__(self, message, line_num=None, code="error", token=None, operand=None):
+        super().__init__(message)
+        self.message = message
+        self.line_num = line_num
+        self.code = code
+        self.token = token
+        self.operand = operand
+
+    def __str__(self):
+        if self.line_num is None:
+            return f"Error: {self.message}"
+        return f"Error at line {self.line_num}: {self.message}"
+
+class AssembledProgram:
+    # Result of assemble_source(): the machine words, the symbol table
+    # (label -> address) and, for every word, the source line it came from.
+    # Iterating over it yields the words, so it can be handed straight to
+    # Simulator.run_simulator.
+    def __init__(self, words, labels, lines):
+        self.words = words
+        self.labels = labels
+        self.lines = lines
 
-def to_binary(num, bits):
-    if num < 0:
-        num = (1 << bits) + num
-    binary = bin(num)[2:]
-    return binary.zfill(bits)
+    def __iter__(self):
+        return iter(self.words)
 
-def check_immediate(imm, bits, line_num):
+    def __len__(self):
+        return len(self.words)
+
+def check_immediate(imm, bits, line_num, token=None, operand=None):
     max_val = (1 << (bits - 1)) - 1
     min_val = -(1 << (bits - 1))
     if imm > max_val or imm < min_val:
-        print(f"Error at line {line_num}: Immediate {imm} out of bounds for {bits} bits")
-        sys.exit(1)
+        raise AssemblerError(f"Immediate {imm} out of bounds for {bits} bits", line_num, "immediate-range", token, operand)
+
+def split_memory_operand(operand):
+    # "imm(reg)" -> (imm, reg), or None if the operand is not of that form
+    imm, sep, reg = operand.partition("(")
+    if not sep or not reg.endswith(")"):
+        return None
+    return imm, reg[:-1].strip()
 
-def parse_r_type(parts, line_num):
+def parse_r_type(parts, inst, line_num, labels, pc):
     if len(parts) != 4:
-        print(f"Error at line {line_num}: Invalid R-type format")
-        sys.exit(1)
-    opcode = parts[0]
+        raise AssemblerError("Invalid R-type format", line_num, "invalid-format")
     rd = registers.get(parts[1])
     rs1 = registers.get(parts[2])
     rs2 = registers.get(parts[3])
-    if not (rd and rs1 and rs2):
-        print(f"Error at line {line_num}: Invalid register name")
-        sys.exit(1)
-    if opcode not in instructions:
-        print(f"Error at line {line_num}: Invalid instruction {opcode}")
-        sys.exit(1)
-    inst = instructions[opcode]
-    return inst["funct7"] + rs2 + rs1 + inst["funct3"] + rd + inst["opcode"]
+    if rd is None or rs1 is None or rs2 is None:
+        raise AssemblerError("Invalid register name", line_num, "invalid-register")
+    return pack_r(inst["funct7"], rs2, rs1, inst["funct3"], rd, inst["opcode"])
 
-def parse_i_type(parts, line_num):
-    opcode = parts[0]
-    if opcode not in instructions:
-        print(f"Error at line {line_num}: Invalid instruction {opcode}")
-        sys.exit(1)
-    inst = instructions[opcode]
-    if opcode == "lw":
-        if len(parts) != 3 or "(" not in parts[2] or ")" not in parts[2]:
-            print(f"Error at line {line_num}: Invalid I-type format for lw")
-            sys.exit(1)
-        rd = registers.get(parts[1])
-        imm_part = parts[2].split("(")
-        try:
-            imm = int(imm_part[0])
-            check_immediate(imm, 12, line_num)
-        except ValueError:
-            print(f"Error at line {line_num}: Invalid immediate {imm_part[0]}")
-            sys.exit(1)
-        rs1 = registers.get(imm_part[1].strip(")"))
-    else:
-        if len(parts) != 4:
-            print(f"Error at line {line_num}: Invalid I-type format")
-            sys.exit(1)
-        rd = registers.get(parts[1])
-        rs1 = registers.get(parts[2])
-        try:
-            imm = int(parts[3])
-            check_immediate(imm, 12, line_num)
-        except ValueError:
-            print(f"Error at line {line_num}: Invalid immediate {parts[3]}")
-            sys.exit(1)
-    if not (rd and rs1):
-        print(f"Error at line {line_num}: Invalid register name")
-        sys.exit(1)
-    imm_bin = to_binary(imm, 12)
-    return imm_bin + rs1 + inst["funct3"] + rd + inst["opcode"]
+def parse_i_type(parts, inst, line_num, labels, pc):
+    if len(parts) != 4:
+        raise AssemblerError("Invalid I-type format", line_num, "invalid-format")
+    rd = registers.get(parts[1])
+    rs1 = registers.get(parts[2])
+    try:
+        imm = int(parts[3])
+        check_immediate(imm, 12, line_num, parts[3], 3)
+    except ValueError:
+        raise AssemblerError(f"Invalid immediate {parts[3]}", line_num, "invalid-immediate", parts[3], 3) from None
+    if rd is None or rs1 is None:
+        raise AssemblerError("Invalid register name", line_num, "invalid-register")
+    return pack_i(imm, rs1, inst["funct3"], rd, inst["opcode"])
 
-def parse_s_type(parts, line_num):
-    if len(parts) != 3 or "(" not in parts[2] or ")" not in parts[2]:
-        print(f"Error at line {line_num}: Invalid S-type format")
-        sys.exit(1)
-    opcode = parts[0]
+def parse_load_type(parts, inst, line_num, labels, pc):
+    mem = split_memory_operand(parts[2]) if len(parts) == 3 else None
+    if mem is None:
+        raise AssemblerError(f"Invalid I-type format for {parts[0]}", line_num, "invalid-format")
+    rd = registers.get(parts[1])
+    try:
+        imm = int(mem[0])
+        check_immediate(imm, 12, line_num, mem[0], 2)
+    except ValueError:
+        raise AssemblerError(f"Invalid immediate {mem[0]}", line_num, "invalid-immediate", mem[0], 2) from None
+    rs1 = registers.get(mem[1])
+    if rd is None or rs1 is None:
+        raise AssemblerError("Invalid register name", line_num, "invalid-register")
+    return pack_i(imm, rs1, inst["funct3"], rd, inst["opcode"])
+
+def parse_shift_type(parts, inst, line_num, labels, pc):
+    if len(parts) != 4:
+        raise AssemblerError("Invalid I-type format", line_num, "invalid-format")
+    rd = registers.get(parts[1])
+    rs1 = registers.get(parts[2])
+    try:
+        shamt = int(parts[3])
+    except ValueError:
+        raise AssemblerError(f"Invalid immediate {parts[3]}", line_num, "invalid-immediate", parts[3], 3) from None
+    if shamt < 0 or shamt > 31:
+        raise AssemblerError(f"Shift amount {shamt} out of bounds (0-31)", line_num, "immediate-range", parts[3], 3)
+    if rd is None or rs1 is None:
+        raise AssemblerError("Invalid register name", line_num, "invalid-register")
+    return pack_i((inst["funct7"] << 5) | shamt, rs1, inst["funct3"], rd, inst["opcode"])
+
+def parse_s_type(parts, inst, line_num, labels, pc):
+    mem = split_memory_operand(parts[2]) if len(parts) == 3 else None
+    if mem is None:
+        raise AssemblerError("Invalid S-type format", line_num, "invalid-format")
     rs2 = registers.get(parts[1])
-    imm_part = parts[2].split("(")
     try:
-        imm = int(imm_part[0])
-        check_immediate(imm, 12, line_num)
+        imm = int(mem[0])
+        check_immediate(imm, 12, line_num, mem[0], 2)
     except ValueError:
-        print(f"Error at line {line_num}: Invalid immediate {imm_part[0]}")
-        sys.exit(1)
-    rs1 = registers.get(imm_part[1].strip(")"))
-    if not (rs2 and rs1):
-        print(f"Error at line {line_num}: Invalid register name")
-        sys.exit(1)
-    if opcode not in instructions:
-        print(f"Error at line {line_num}: Invalid instruction {opcode}")
-        sys.exit(1)
-    inst = instructions[opcode]
-    imm_bin = to_binary(imm, 12)
-    return imm_bin[0:7] + rs2 + rs1 + inst["funct3"] + imm_bin[7:12] + inst["opcode"]
+        raise AssemblerError(f"Invalid immediate {mem[0]}", line_num, "invalid-immediate", mem[0], 2) from None
+    rs1 = registers.get(mem[1])
+    if rs2 is None or rs1 is None:
+        raise AssemblerError("Invalid register name", line_num, "invalid-register")
+    return pack_s(imm, rs2, rs1, inst["funct3"], inst["opcode"])
 
-def parse_b_type(parts, line_num, labels, pc):
+def parse_b_type(parts, inst, line_num, labels, pc):
     if len(parts) != 4:
-        print(f"Error at line {line_num}: Invalid B-type format")
-        sys.exit(1)
-    opcode = parts[0]
+        raise AssemblerError("Invalid B-type format", line_num, "invalid-format")
     rs1 = registers.get(parts[1])
     rs2 = registers.get(parts[2])
     if parts[3] in labels:
@@ -131,27 +168,30 @@ def parse_b_type(parts, line_num, labels, pc):
         try:
             imm = int(parts[3])
         except ValueError:
-            print(f"Error at line {line_num}: Invalid immediate or label {parts[3]}")
-            sys.exit(1) 
+            raise AssemblerError(f"Invalid immediate or label {parts[3]}", line_num, "undefined-label", parts[3], 3) from None
     if imm % 2 != 0:
-        print(f"Error at line {line_num}: Branch offset must be even (align to halfword)")
-        sys.exit(1)
-    check_immediate(imm, 13, line_num)
-    if not (rs1 and rs2):
-        print(f"Error at line {line_num}: Invalid register name")
-        sys.exit(1)
-    if opcode not in instructions:
-        print(f"Error at line {line_num}: Invalid instruction {opcode}")
-        sys.exit(1)     
-    inst = instructions[opcode]
-    imm_bin = to_binary(imm, 13)  
-    return imm_bin[0] + imm_bin[2:8] + rs2 + rs1 + inst["funct3"] + imm_bin[8:12] + imm_bin[1] + inst["opcode"]
-
-def parse_j_type(parts, line_num, labels, pc):
+        raise AssemblerError("Branch offset must be even (align to halfword)", line_num, "misaligned-offset", parts[-1], 3)
+    check_immediate(imm, 13, line_num, parts[3], 3)
+    if rs1 is None or rs2 is None:
+        raise AssemblerError("Invalid register name", line_num, "invalid-register")
+    return pack_b(imm, rs2, rs1, inst["funct3"], inst["opcode"])
+
+def parse_u_type(parts, inst, line_num, labels, pc):
     if len(parts) != 3:
-        print(f"Error at line {line_num}: Invalid J-type format")
-        sys.exit(1)
-    opcode = parts[0]
+        raise AssemblerError("Invalid U-type format", line_num, "invalid-format")
+    rd = registers.get(parts[1])
+    try:
+        imm = int(parts[2])
+        check_immediate(imm, 20, line_num, parts[2], 2)
+    except ValueError:
+        raise AssemblerError(f"Invalid immediate {parts[2]}", line_num, "invalid-immediate", parts[2], 2) from None
+    if rd is None:
+        raise AssemblerError("Invalid register name", line_num, "invalid-register")
+    return pack_u(imm, rd, inst["opcode"])
+
+def parse_j_type(parts, inst, line_num, labels, pc):
+    if len(parts) != 3:
+        raise AssemblerError("Invalid J-type format", line_num, "invalid-format")
     rd = registers.get(parts[1])
     if parts[2] in labels:
         imm = labels[parts[2]] - pc  
@@ -159,108 +199,748 @@ def parse_j_type(parts, line_num, labels, pc):
         try:
             imm = int(parts[2])
         except ValueError:
-            print(f"Error at line {line_num}: Invalid immediate or label {parts[2]}")
-            sys.exit(1)
+            raise AssemblerError(f"Invalid immediate or label {parts[2]}", line_num, "undefined-label", parts[2], 2) from None
     if imm % 2 != 0:
-        print(f"Error at line {line_num}: Jump offset must be even (align to halfword)")
-        sys.exit(1)
-    check_immediate(imm, 21, line_num)
-    if not rd:
-        print(f"Error at line {line_num}: Invalid register name")
-        sys.exit(1)
-    if opcode not in instructions:
-        print(f"Error at line {line_num}: Invalid instruction {opcode}")
-        sys.exit(1)  
-    inst = instructions[opcode]
-    imm_bin = to_binary(imm, 21)
-    return imm_bin[0] + imm_bin[10:20] + imm_bin[9] + imm_bin[1:9] + rd + inst["opcode"]
+        raise AssemblerError("Jump offset must be even (align to halfword)", line_num, "misaligned-offset", parts[-1], 2)
+    check_immediate(imm, 21, line_num, parts[2], 2)
+    if rd is None:
+        raise AssemblerError("Invalid register name", line_num, "invalid-register")
+    return pack_j(imm, rd, inst["opcode"])
 
 
-def parse_bonus_type(parts, line_num):
+def parse_bonus_type(parts, inst, line_num, labels, pc):
     if len(parts) != 1:
-        print(f"Error at line {line_num}: {parts[0]} takes no operands")
-        sys.exit(1)
-    opcode = parts[0]
-    if opcode not in instructions:
-        print(f"Error at line {line_num}: Invalid instruction {opcode}")
-        sys.exit(1)
-    inst = instructions[opcode]
-    return "000000000000" + "00000" + inst["funct3"] + "00000" + inst["opcode"]
+        raise AssemblerError(f"{parts[0]} takes no operands", line_num, "invalid-format")
+    return pack_i(0, 0, inst["funct3"], 0, inst["opcode"])
+
+parsers = {
+    "R": parse_r_type, "I": parse_i_type, "IL": parse_load_type, "IS": parse_shift_type,
+    "S": parse_s_type, "B": parse_b_type, "U": parse_u_type, "J": parse_j_type,
+    "SP": parse_bonus_type
+}
+# Formats whose immediate may be a label resolved against the current pc
+label_formats = ("B", "J")
+
+# mnemonic -> (format handler, encoding), built once at import
+dispatch = {mnemonic: (parsers[inst["format"]], inst) for mnemonic, inst in instructions.items()}
+
+def encode_instruction(parts, line_num, labels, pc):
+    entry = dispatch.get(parts[0])
+    if entry is None:
+        raise AssemblerError(f"Invalid instruction {parts[0]}", line_num, "invalid-instruction", parts[0], 0)
+    return entry[0](parts, entry[1], line_num, labels, pc)
+
+terminator_instructions = [
+    encode_instruction(["beq", "zero", "zero", "0"], 0, {}, 0),
+    encode_instruction(["halt"], 0, {}, 0)
+]
+
+def lex_line(line, line_num):
+    # Splits a source line into (label, tokens), dropping any "#" comment.
+    # Returns None for blank and comment-only lines. str methods are used
+    # throughout as they are several times faster than a regex in CPython.
+    if "#" in line:
+        line = line[:line.index("#")]
+    label = None
+    if ":" in line:
+        label, line = line.split(":", 1)
+        label = label.strip()
+        if not label or not label[0].isalpha():
+            raise AssemblerError("Label must start with a character", line_num, "invalid-label")
+    parts = line.replace(",", " ").split()
+    if label is None and not parts:
+        return None
+    return label, parts
+
+# Machine code output formats; the simulator detects which one it is given
+OUTPUT_FORMATS = ("text", "hex", "bin")
+
+def open_output(output_file, output_format="text"):
+    return open(output_file, "wb" if output_format == "bin" else "w")
 
-def assemble(input_file, output_file):
+def write_words(words, f, output_format="text"):
+    # "text" writes one 32-character binary string per line, "hex" one
+    # 8-digit hex word per line and "bin" the raw words as a little-endian
+    # image
+    if output_format == "bin":
+        f.write(struct.pack(f"<{len(words)}I", *words))
+    elif output_format == "hex":
+        f.write("".join(format(word, "08x") + "\n" for word in words))
+    else:
+        f.write("".join(format(word, "032b") + "\n" for word in words))
+
+def define_label(label, line_num, labels, pc):
+    if label in labels:
+        raise AssemblerError(f"Duplicate label '{label}'", line_num, "duplicate-label", label)
+    labels[label] = pc
+
+def is_terminator(parts, labels, pc):
+    if parts[0] == "halt":
+        return True
+    if parts[0] == "beq" and parts[1] == "zero" and parts[2] == "zero":
+        try:
+            return int(parts[3]) == 0
+        except ValueError:
+            return labels.get(parts[3]) == pc
+    return False
+
+def check_terminator(has_terminator, last_word):
+    if not has_terminator:
+        raise AssemblerError("Missing terminating instruction (beq zero,zero,0 or halt)", None, "missing-terminator")
+    if last_word not in terminator_instructions:
+        raise AssemblerError("Terminating instruction (beq zero,zero,0 or halt) must be last", None, "terminator-not-last")
+
+def assemble(input_file, output_file, output_format="text"):
     with open(input_file, "r") as f:
         lines = f.readlines()
     labels = {}
     instruction_lines = []
     pc = 0  
     for i, line in enumerate(lines, 1):
-        clean_line = line.strip()
-        if not clean_line:
+        lexed = lex_line(line, i)
+        if lexed is None:
             continue
-        if ":" in clean_line:
-            parts = clean_line.split(":", 1)
-            label = parts[0].strip()
-            if not label[0].isalpha():
-                print(f"Error at line {i}: Label must start with a character")
-                sys.exit(1)
-            if label in labels:
-                print(f"Error at line {i}: Duplicate label '{label}'")
-                sys.exit(1)             
-            labels[label] = pc
-            clean_line = parts[1].strip()
-        if not clean_line:
+        label, parts = lexed
+        if label is not None:
+            define_label(label, i, labels, pc)
+        if not parts:
             continue           
-        instruction_lines.append((i, clean_line))
+        instruction_lines.append((i, tuple(parts)))
         pc += 4  
-    binary_lines = []
+    words = []
     pc = 0
     has_terminator = False   
-    for line_num, line in instruction_lines:
-        parts = line.replace(",", " ").split()
-        opcode = parts[0]
-        if opcode in ["add", "sub", "slt", "srl", "or"]:
-            binary = parse_r_type(parts, line_num)
-        elif opcode in ["addi", "lw", "jalr"]:
-            binary = parse_i_type(parts, line_num)
-        elif opcode == "sw":
-            binary = parse_s_type(parts, line_num)
-        elif opcode in ["beq", "bne"]:
-            binary = parse_b_type(parts, line_num, labels, pc)
-            if opcode == "beq" and parts[1] == "zero" and parts[2] == "zero":
-                is_zero_offset = False
-                try:
-                    is_zero_offset = (int(parts[3]) == 0)
-                except ValueError:
-                    if parts[3] in labels and labels[parts[3]] == pc:
-                        is_zero_offset = True
-                        
-                if is_zero_offset:
+    for line_num, parts in instruction_lines:
+        words.append(encode_instruction(parts, line_num, labels, pc))
+        if is_terminator(parts, labels, pc):
+            has_terminator = True
+        pc += 4
+    check_terminator(has_terminator, words[-1] if words else None)
+    write_output(words, output_file, output_format)
+    print(f"Successfully assembled. Output written to {output_file}")
+
+def is_label_reference(operand):
+    try:
+        int(operand)
+        return False
+    except ValueError:
+        return True
+
+# Streaming pipeline: tokenize -> parse_statements -> encode_statements ->
+# write_stream. Each stage is a generator, so a source of any size is
+# assembled with memory bounded by the longest pending forward reference.
+
+def tokenize(lines):
+    # Lexer: yields (line number, label, tokens) for every non-blank line
+    for line_num, line in enumerate(lines, 1):
+        lexed = lex_line(line, line_num)
+        if lexed is not None:
+            yield line_num, lexed[0], lexed[1]
+
+def parse_statements(tokens):
+    # Parser: assigns each statement its address. A label on a line of its
+    # own takes the address of the next instruction.
+    pc = 0
+    for line_num, label, parts in tokens:
+        yield line_num, label, parts, pc
+        if parts:
+            pc += 4
+
+def encode_statements(statements, labels=None):
+    # Encoder: yields (line number, word) in program order. Branches and
+    # jumps to labels that are not yet defined get a placeholder and an
+    # entry in the fixup table; the word is patched (and range checked) as
+    # soon as the label is defined and held back until then. Labels are
+    # recorded in `labels` if a dict is passed in.
+    #
+    # Errors are raised in the same order as the two-pass assemble(): label
+    # and syntax errors from the lexer first, then the encoding error with
+    # the lowest line number. So an encoding error is not raised at once.
+    # The rest of the source is still read for its labels, and the fixups
+    # on earlier lines are still resolved, since one of them may fail too.
+    if labels is None:
+        labels = {}
+    fixups = {}     # label -> [(word index, line number, parts, pc)]
+    pending = []    # [line number, word] not yet yielded, the first at index `emitted`
+    emitted = 0
+    has_terminator = False
+    last_word = None
+    error = None    # the encoding error with the lowest line number so far
+
+    def encode(parts, line_num, pc):
+        nonlocal error
+        try:
+            return encode_instruction(parts, line_num, labels, pc)
+        except AssemblerError as e:
+            if error is None or e.line_num < error.line_num:
+                error = e
+            return 0
+
+    for line_num, label, parts, pc in statements:
+        if label is not None:
+            define_label(label, line_num, labels, pc)
+            for index, fix_line, fix_parts, fix_pc in fixups.pop(label, ()):
+                pending[index - emitted][1] = encode(fix_parts, fix_line, fix_pc)
+        if parts and (error is None or line_num <= error.line_num):
+            opcode = parts[0]
+            target = parts[-1]
+            if opcode in instructions and instructions[opcode]["format"] in label_formats \
+                    and target not in labels and is_label_reference(target):
+                fixups.setdefault(target, []).append((emitted + len(pending), line_num, parts, pc))
+                pending.append([line_num, 0])
+            else:
+                pending.append([line_num, encode(parts, line_num, pc)])
+                if error is None and is_terminator(parts, labels, pc):
                     has_terminator = True
-        elif opcode == "jal":
-            binary = parse_j_type(parts, line_num, labels, pc)
-        elif opcode in ["rst", "halt"]:
-            binary = parse_bonus_type(parts, line_num)
-            if opcode == "halt":
+        # Checked after label-only lines too: a label on the last line can
+        # resolve the fixup that held back the final words
+        if pending and not fixups and error is None:
+            last_word = pending[-1][1]
+            for entry_line, word in pending:
+                yield entry_line, word
+            emitted += len(pending)
+            pending = []
+    # Anything still unresolved refers to a label that was never defined;
+    # encoding it again reports the error for that line.
+    for entries in fixups.values():
+        for index, fix_line, fix_parts, fix_pc in entries:
+            encode(fix_parts, fix_line, fix_pc)
+    if error is not None:
+        raise error
+    check_terminator(has_terminator, last_word)
+
+def assemble_stream(lines):
+    # Library entry point: yields (line number, word) pairs for the given
+    # source lines (any iterable, e.g. an open file)
+    return encode_statements(parse_statements(tokenize(lines)))
+
+def assemble_source(text, optimize=False):
+    # In-memory entry point: assembles the given source text and returns an
+    # AssembledProgram. Errors are raised as AssemblerError. With optimize
+    # the statements go through the peephole pass first.
+    labels = {}
+    words = []
+    lines = []
+    statements = parse_statements(tokenize(text.splitlines()))
+    if optimize:
+        statements = optimize_statements(statements)
+    for line_num, word in encode_statements(statements, labels):
+        lines.append(line_num)
+        words.append(word)
+    return AssembledProgram(words, labels, lines)
+
+def write_listing(program, source_lines, listing_file):
+    # Listing / map file: one tab separated line per word with its address,
+    # the word, the source line number, the labels defined at that address
+    # (comma separated, possibly empty) and the source text. Simulator.py
+    # loads it with load_listing() to name source lines in its reports.
+    names = {}
+    for label, address in program.labels.items():
+        names.setdefault(address, []).append(label)
+    with open(listing_file, "w") as f:
+        f.write("# address\tword\tline\tlabels\tsource\n")
+        for index, (word, line_num) in enumerate(zip(program.words, program.lines)):
+            address = index * 4
+            source = source_lines[line_num - 1].strip()
+            f.write(f"0x{address:08X}\t{word:032b}\t{line_num}\t{','.join(names.get(address, ()))}\t{source}\n")
+
+def assemble_with_listing(input_file, output_file, listing_file, output_format="text", optimize=False):
+    with open(input_file, "r") as f:
+        text = f.read()
+    program = assemble_source(text, optimize)
+    write_output(program.words, output_file, output_format)
+    write_listing(program, text.splitlines(), listing_file)
+    print(f"Successfully assembled. Output written to {output_file}")
+
+# One entry of assemble_diagnostics(). line and column are 1-based; both are
+# None for errors that concern the whole program.
+Diagnostic = namedtuple("Diagnostic", ["line", "column", "code", "message"])
+
+def token_columns(source_line):
+    # 1-based column of each token lex_line() finds in the instruction part
+    # of source_line, so an error can point at the operand it is about even
+    # when the same text appears earlier in the line
+    code = source_line.split("#", 1)[0]
+    start = code.index(":") + 1 if ":" in code else 0
+    columns = []
+    in_token = False
+    for index in range(start, len(code)):
+        if code[index].isspace() or code[index] == ",":
+            in_token = False
+        elif not in_token:
+            columns.append(index + 1)
+            in_token = True
+    return columns
+
+def make_diagnostic(error, source_line=None):
+    column = None
+    if source_line is not None:
+        columns = token_columns(source_line)
+        if error.operand is not None and error.operand < len(columns):
+            column = columns[error.operand]
+        elif error.token:
+            # label errors, which are not about an instruction token
+            column = source_line.find(error.token) + 1
+        if not column:
+            column = len(source_line) - len(source_line.lstrip()) + 1
+    return Diagnostic(error.line_num, column, error.code, error.message)
+
+def format_diagnostic(diagnostic):
+    if diagnostic.line is None:
+        return f"{diagnostic.code}: {diagnostic.message}"
+    return f"{diagnostic.line}:{diagnostic.column}: {diagnostic.code}: {diagnostic.message}"
+
+def assemble_diagnostics(text):
+    # Collect-all-errors mode: keeps going after an error and returns every
+    # problem in the source as a list of Diagnostic, in line order. An empty
+    # list means the program assembles.
+    source_lines = text.splitlines()
+    diagnostics = []
+    labels = {}
+    statements = []
+    pc = 0
+    for line_num, line in enumerate(source_lines, 1):
+        try:
+            lexed = lex_line(line, line_num)
+        except AssemblerError as e:
+            diagnostics.append(make_diagnostic(e, line))
+            continue
+        if lexed is None:
+            continue
+        label, parts = lexed
+        if label is not None:
+            # A duplicate label is reported, but the instruction after it
+            # is still assembled
+            try:
+                define_label(label, line_num, labels, pc)
+            except AssemblerError as e:
+                diagnostics.append(make_diagnostic(e, line))
+        if parts:
+            statements.append((line_num, parts, pc))
+            pc += 4
+    has_terminator = False
+    last_word = None
+    for line_num, parts, pc in statements:
+        try:
+            last_word = encode_instruction(parts, line_num, labels, pc)
+            if is_terminator(parts, labels, pc):
                 has_terminator = True
+        except AssemblerError as e:
+            diagnostics.append(make_diagnostic(e, source_lines[line_num - 1]))
+            last_word = None
+    diagnostics.sort(key=lambda d: d.line)
+    try:
+        check_terminator(has_terminator, last_word)
+    except AssemblerError as e:
+        diagnostics.append(make_diagnostic(e))
+    return diagnostics
+
+# Number of words buffered before they are written out
+FLUSH_WORDS = 1024
+
+def write_stream(words, output_file, output_format="text"):
+    # Buffered writer: consumes (line number, word) pairs. Words are written
+    # under a temporary name next to output_file, which is renamed into
+    # place only once the whole source has assembled, so an error never
+    # leaves an empty or partial output file behind.
+    buffer = []
+    tmp = f"{output_file}.{os.getpid()}.tmp"
+    try:
+        with open_output(tmp, output_format) as f:
+            for _, word in words:
+                buffer.append(word)
+                if len(buffer) >= FLUSH_WORDS:
+                    write_words(buffer, f, output_format)
+                    buffer = []
+            write_words(buffer, f, output_format)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, output_file)
+
+def write_output(words, output_file, output_format="text"):
+    # Writes a list of words the same all-or-nothing way as write_stream()
+    write_stream(((None, word) for word in words), output_file, output_format)
+
+def assemble_single_pass(input_file, output_file, output_format="text"):
+    with open(input_file, "r") as src:
+        write_stream(assemble_stream(src), output_file, output_format)
+    print(f"Successfully assembled. Output written to {output_file}")
+
+# Peephole optimizer (-O). Runs over the parsed statements before encoding:
+#   - drops addi rd, rd, 0 and instructions whose only effect is a write to zero
+#   - folds addi rd, rs, a followed by addi rd, rd, b into addi rd, rs, a+b
+#   - points a branch or jump at an unconditional jump straight at that
+#     jump's target, and drops branches and jumps to the next instruction
+# Targets are kept as statement indices while instructions are removed and
+# turned back into labels or offsets at the end, so every offset is
+# recomputed. Programs that can observe their own addresses (auipc, jalr,
+# jal with a link register) are left as they are.
+
+def is_unconditional_jump(parts):
+    if parts[0] == "jal":
+        return registers[parts[1]] == 0
+    return parts[0] == "beq" and registers[parts[1]] == 0 and registers[parts[2]] == 0
+
+def observes_pc(parts):
+    return parts[0] in ("auipc", "jalr") or (parts[0] == "jal" and registers[parts[1]] != 0)
+
+def writes_only_zero(parts):
+    return instructions[parts[0]]["format"] in ("R", "I", "IL", "IS", "U") and registers[parts[1]] == 0
+
+def next_kept(removed, index):
+    # The terminator is last and never removed, so this always stops
+    while removed[index]:
+        index += 1
+    return index
+
+def optimize_statements(statements):
+    # Takes and returns (line number, label, parts, pc) statements as yielded
+    # by parse_statements
+    original = list(statements)
+    labels = {}
+    items = []      # [line number, [(line number, label)], parts, target index, target label]
+    pending_labels = []
+    for line_num, label, parts, pc in original:
+        if label is not None:
+            define_label(label, line_num, labels, pc)
+            pending_labels.append((line_num, label))
+        if parts:
+            items.append([line_num, pending_labels, list(parts), None, None])
+            pending_labels = []
+    # Everything is encoded once as written, so errors are reported against
+    # the source and nothing invalid can be optimized away
+    has_terminator = False
+    last_word = None
+    for index, (line_num, _, parts, _, _) in enumerate(items):
+        last_word = encode_instruction(parts, line_num, labels, index * 4)
+        if is_terminator(parts, labels, index * 4):
+            has_terminator = True
+    check_terminator(has_terminator, last_word)
+
+    entries = set()     # indices that are labelled or branched to
+    for index, item in enumerate(items):
+        parts = item[2]
+        if item[1]:
+            entries.add(index)
+        if observes_pc(parts):
+            return original
+        if instructions[parts[0]]["format"] in label_formats:
+            if parts[-1] in labels:
+                item[3], item[4] = labels[parts[-1]] // 4, parts[-1]
+            else:
+                offset = int(parts[-1])
+                if offset % 4:
+                    return original
+                item[3] = index + offset // 4
+            if not 0 <= item[3] < len(items):
+                return original
+            entries.add(item[3])
+
+    removed = [False] * len(items)
+    changed = True
+    while changed:
+        changed = False
+        for index, item in enumerate(items):
+            if removed[index]:
+                continue
+            parts = item[2]
+            target = item[3]
+            if writes_only_zero(parts) or (parts[0] == "addi" and registers[parts[1]] == registers[parts[2]]
+                                           and int(parts[3]) == 0):
+                removed[index] = changed = True
+                continue
+            if target is not None:
+                if index + 1 < len(items) and next_kept(removed, index + 1) == next_kept(removed, target):
+                    removed[index] = changed = True
+                    continue
+                final = next_kept(removed, target)
+                final_label = item[4]
+                seen = set()
+                while final not in seen and is_unconditional_jump(items[final][2]) \
+                        and next_kept(removed, items[final][3]) != final:
+                    seen.add(final)
+                    final, final_label = next_kept(removed, items[final][3]), items[final][4]
+                # Removing instructions only brings kept ones closer, so a
+                # range check on the original addresses is enough
+                bits = 13 if instructions[parts[0]]["format"] == "B" else 21
+                if final not in (index, next_kept(removed, target)) and abs(final - index) * 4 < 1 << (bits - 1):
+                    item[3], item[4] = final, final_label
+                    entries.add(final)
+                    changed = True
+                continue
+            if parts[0] == "addi" and index + 1 < len(items):
+                following = next_kept(removed, index + 1)
+                next_parts = items[following][2]
+                if next_parts[0] == "addi" and registers[next_parts[1]] == registers[next_parts[2]] == registers[parts[1]] \
+                        and not entries.intersection(range(index + 1, following + 1)):
+                    imm = int(parts[3]) + int(next_parts[3])
+                    if -2048 <= imm <= 2047:
+                        parts[3] = str(imm)
+                        removed[following] = changed = True
+
+    pcs = []
+    pc = 0
+    for index in range(len(items)):
+        pcs.append(pc)      # a removed instruction's labels move to the next one kept
+        if not removed[index]:
+            pc += 4
+    optimized = []
+    for index, (line_num, item_labels, parts, target, target_label) in enumerate(items):
+        for label_line, label in item_labels:
+            optimized.append((label_line, label, (), pcs[index]))
+        if removed[index]:
+            continue
+        if target is not None:
+            parts[-1] = target_label if target_label is not None else str(pcs[target] - pcs[index])
+        optimized.append((line_num, None, tuple(parts), pcs[index]))
+    for label_line, label in pending_labels:
+        optimized.append((label_line, label, (), pc))
+    return optimized
+
+def assemble_optimized(input_file, output_file, output_format="text"):
+    with open(input_file, "r") as f:
+        program = assemble_source(f.read(), optimize=True)
+    write_output(program.words, output_file, output_format)
+    print(f"Successfully assembled. Output written to {output_file}")
+
+# Assembly cache. A whole-file entry keyed by a hash of the source and of the
+# assembler itself turns re-assembling an unchanged file into a hash check.
+# On a miss the line table saved for the same input file is consulted, so
+# after an edit only the lines whose encoding can have changed are encoded
+# again. Entries are evicted least recently used first once the directory
+# grows past CACHE_MAX_BYTES.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".asm_cache")
+CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+_assembler_version = None
+
+def assembler_version():
+    # Hash of this file and the ISA tables, so changing either one
+    # invalidates everything cached by an older assembler
+    global _assembler_version
+    if _assembler_version is None:
+        h = hashlib.sha256()
+        for path in (os.path.abspath(__file__), os.path.abspath(isa.__file__)):
+            with open(path, "rb") as f:
+                h.update(f.read())
+        _assembler_version = h.hexdigest()
+    return _assembler_version
+
+def line_key(parts, labels, pc):
+    # Line table key for one instruction. The word depends only on its
+    # tokens, except for a branch or jump to a label where it depends on the
+    # offset to the label rather than on the label's name or address.
+    inst = instructions.get(parts[0])
+    if inst is not None and inst["format"] in label_formats and parts[-1] in labels:
+        return " ".join(parts[:-1]) + " @" + str(labels[parts[-1]] - pc)
+    return " ".join(parts)
+
+def encode_cached(source_lines, line_table):
+    # Two-pass assembly taking the word for every line whose key is in
+    # line_table instead of encoding it. Returns the words and the line
+    # table for this source.
+    labels = {}
+    statements = []
+    for line_num, label, parts, pc in parse_statements(tokenize(source_lines)):
+        if label is not None:
+            define_label(label, line_num, labels, pc)
+        if parts:
+            statements.append((line_num, parts, pc))
+    words = []
+    new_table = {}
+    has_terminator = False
+    for line_num, parts, pc in statements:
+        key = line_key(parts, labels, pc)
+        word = line_table.get(key)
+        if word is None:
+            word = encode_instruction(parts, line_num, labels, pc)
+        new_table[key] = word
+        words.append(word)
+        if is_terminator(parts, labels, pc):
+            has_terminator = True
+    check_terminator(has_terminator, words[-1] if words else None)
+    return words, new_table
+
+def read_cache_entry(path):
+    try:
+        with open(path, "r") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    os.utime(path)      # mark as recently used
+    return entry
+
+def write_cache_entry(path, entry):
+    # Written under a temporary name and renamed, so a concurrent run never
+    # reads a partial entry
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(entry, f)
+    os.replace(tmp, path)
+
+def evict_cache(cache_dir, max_bytes=CACHE_MAX_BYTES):
+    entries = []
+    total = 0
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".json"):
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+def assemble_cached(input_file, output_file, output_format="text", cache_dir=CACHE_DIR):
+    with open(input_file, "rb") as f:
+        source = f.read()
+    version = assembler_version()
+    os.makedirs(cache_dir, exist_ok=True)
+    entry_path = os.path.join(cache_dir, hashlib.sha256(version.encode() + source).hexdigest() + ".json")
+    entry = read_cache_entry(entry_path)
+    if entry is None:
+        path_hash = hashlib.sha256(os.path.abspath(input_file).encode()).hexdigest()
+        table_path = os.path.join(cache_dir, "lines-" + path_hash + ".json")
+        table = read_cache_entry(table_path)
+        line_table = table["lines"] if table is not None and table.get("version") == version else {}
+        words, line_table = encode_cached(source.decode().splitlines(), line_table)
+        entry = {"words": words}
+        write_cache_entry(entry_path, entry)
+        write_cache_entry(table_path, {"version": version, "lines": line_table})
+        evict_cache(cache_dir)
+    write_output(entry["words"], output_file, output_format)
+    print(f"Successfully assembled. Output written to {output_file}")
+
+# Batch mode. Sources are spread over a process pool; each worker imports
+# this module once, so the register, dispatch and terminator tables are
+# built once per worker rather than once per file.
+
+def expand_sources(specs):
+    # Directories are searched recursively for .txt files, anything else is
+    # taken as a glob pattern. Returns absolute paths without duplicates.
+    sources = []
+    for spec in specs:
+        if os.path.isdir(spec):
+            found = []
+            for dirpath, _, filenames in os.walk(spec):
+                found.extend(os.path.join(dirpath, name) for name in filenames if name.endswith(".txt"))
         else:
-            print(f"Error at line {line_num}: Invalid instruction {opcode}")
+            found = glob.glob(spec, recursive=True)
+        sources.extend(os.path.abspath(path) for path in sorted(found))
+    return list(dict.fromkeys(sources))
+
+def assemble_file(input_file, output_file, output_format="text"):
+    # Batch worker. Returns (status, number of words, message); nothing is
+    # raised, so one bad source cannot stop the batch.
+    try:
+        with open(input_file, "r") as f:
+            program = assemble_source(f.read())
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        write_output(program.words, output_file, output_format)
+    except AssemblerError as e:
+        return "error", 0, str(e)
+    except (OSError, UnicodeDecodeError) as e:
+        return "error", 0, f"Error: {e}"
+    return "ok", len(program.words), ""
+
+def assemble_batch(specs, output_dir, jobs=None, output_format="text"):
+    # Assembles every source matched by specs into output_dir, keeping their
+    # paths relative to the sources' common directory, and writes the per
+    # file status to output_dir/manifest.txt. Returns the manifest rows as
+    # (source, output, status, words, message).
+    sources = expand_sources(specs)
+    if not sources:
+        return []
+    root = os.path.commonpath([os.path.dirname(path) for path in sources])
+    outputs = [os.path.join(output_dir, os.path.relpath(path, root)) for path in sources]
+    jobs = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(assemble_file, sources, outputs, [output_format] * len(sources),
+                                chunksize=max(1, len(sources) // (jobs * 4))))
+    rows = [(source, output) + result for source, output, result in zip(sources, outputs, results)]
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "manifest.txt"), "w") as f:
+        f.write("# source\toutput\tstatus\twords\tmessage\n")
+        for source, output, status, count, message in rows:
+            f.write(f"{source}\t{output}\t{status}\t{count}\t{message}\n")
+    return rows
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    output_format = "text"
+    if "--format" in args and args.index("--format") + 1 < len(args):
+        index = args.index("--format")
+        output_format = args[index + 1]
+        del args[index:index + 2]
+        if output_format not in OUTPUT_FORMATS:
+            print(f"Unknown output format {output_format}, expected one of {', '.join(OUTPUT_FORMATS)}")
             sys.exit(1)
-        binary_lines.append(binary)
-        pc += 4
-    if not has_terminator:
-        print("Error: Missing terminating instruction (beq zero,zero,0 or halt)")
-        sys.exit(1)
-    terminator_instructions = ["00000000000000000000000001100011", "000000000000000000010000001110011"]
-    if binary_lines[-1] not in terminator_instructions:
-        print("Error: Terminating instruction (beq zero,zero,0 or halt) must be last")
+    if args and args[0] == "--batch":
+        args = args[1:]
+        batch_usage = "Usage: python3 Assembler.py --batch [--jobs N] output_dir source_dir_or_glob..."
+        jobs = None
+        if "--jobs" in args:
+            index = args.index("--jobs")
+            try:
+                jobs = int(args[index + 1])
+            except (IndexError, ValueError):
+                jobs = 0
+            if jobs < 1:
+                print(batch_usage)
+                sys.exit(1)
+            del args[index:index + 2]
+        if len(args) < 2:
+            print(batch_usage)
+            sys.exit(1)
+        rows = assemble_batch(args[1:], args[0], jobs, output_format)
+        failed = sum(1 for row in rows if row[2] != "ok")
+        print(f"Assembled {len(rows)} files, {failed} with errors. Manifest written to "
+              f"{os.path.join(args[0], 'manifest.txt')}")
+        sys.exit(1 if failed or not rows else 0)
+    if len(args) == 2 and args[0] == "--all-errors":
+        with open(args[1], "r") as f:
+            diagnostics = assemble_diagnostics(f.read())
+        for diagnostic in diagnostics:
+            print(format_diagnostic(diagnostic))
+        sys.exit(1 if diagnostics else 0)
+    two_pass = "--two-pass" in args
+    if two_pass:
+        args.remove("--two-pass")
+    cache = "--cache" in args
+    if cache:
+        args.remove("--cache")
+    optimize = "-O" in args
+    if optimize:
+        args.remove("-O")
+    listing_file = None
+    if "--listing" in args and args.index("--listing") + 1 < len(args):
+        index = args.index("--listing")
+        listing_file = args[index + 1]
+        del args[index:index + 2]
+    if len(args) != 2:
+        print("Usage: python3 Assembler.py [--format text|hex|bin] [--two-pass | --cache | -O] input_assembly_file output_machine_code_file")
+        print("       python3 Assembler.py [--format text|hex|bin] [-O] --listing listing_file input_assembly_file output_machine_code_file")
+        print("       python3 Assembler.py --all-errors input_assembly_file")
+        print("       python3 Assembler.py [--format text|hex|bin] --batch [--jobs N] output_dir source_dir_or_glob...")
         sys.exit(1)
-    with open(output_file, "w") as f:
-        for binary in binary_lines:
-            f.write(binary + "\n")
-    print(f"Successfully assembled. Output written to {output_file}")
-
-if __name__ == "_main_":
-    if len(sys.argv) != 3:
-        print("Usage: python assembler.py input.asm output.bin")
+    try:
+        if listing_file is not None:
+            assemble_with_listing(args[0], args[1], listing_file, output_format, optimize)
+        elif optimize:
+            assemble_optimized(args[0], args[1], output_format)
+        elif cache:
+            assemble_cached(args[0], args[1], output_format)
+        elif two_pass:
+            assemble(args[0], args[1], output_format)
+        else:
+            assemble_single_pass(args[0], args[1], output_format)
+    except AssemblerError as e:
+        print(e)
         sys.exit(1)
-    assemble(sys.argv[1], sys.argv[2])
@@ -1,5 +1,7 @@
 # Result generator class
 
+import json
+
 from colors import bcolors
 
 class Results:
@@ -7,6 +9,11 @@ class Results:
 	VERBOSE = False
 	asmRes = None
 	simRes = None
+	# {tool: Grader.stats()} of the graders that ran
+	stats = None
+
+	# Rows of the slowest tests table
+	SLOWEST = 10
 
 
 	def declareARes(self, res):
@@ -26,6 +33,27 @@ class Results:
 		print(bcolors.BOLD + bcolors.OKGREEN + "Total: " + str(totalMarksGained) + " out of " + str(totalMarks))
 		print(bcolors.ENDC, end="")
 
+	def formatSeconds(self, seconds):
+		return "-" if seconds is None else "%.3f" % seconds
+
+	def declareStats(self):
+		tests = [t for s in self.stats.values() for t in s["tests"] if t["wall"] is not None]
+		if not tests:
+			return
+		print("\n============== SLOWEST TESTS ===========\n")
+		print("%-10s %-8s %-24s %9s %9s %10s" % ("Tool", "Suite", "Test", "Wall (s)", "CPU (s)", "RSS (MB)"))
+		for t in sorted(tests, key=lambda t: t["wall"], reverse=True)[:self.SLOWEST]:
+			rss = "-" if t["rss"] is None else "%.1f" % (t["rss"] / 1024)
+			print("%-10s %-8s %-24s %9s %9s %10s" % (t["tool"], t["suite"], t["test"] + (" *" if t["cached"] else ""),
+												   self.formatSeconds(t["wall"]), self.formatSeconds(t["cpu"]), rss))
+		if any(t["cached"] for t in tests):
+			print("* cached, times are from the run it was cached from")
+		if self.VERBOSE:
+			for s in [s for stats in self.stats.values() for s in stats["suites"]]:
+				print(s["tool"] + " " + s["suite"] + ": " + str(s["run"]) + " of " + str(s["tests"]) + " tests run, wall " +
+					  self.formatSeconds(s["wall"]) + "s, cpu " + self.formatSeconds(s["cpu"]) + "s, child cpu " +
+					  self.formatSeconds(s["childCpu"]) + "s")
+
 	def declare(self):
 		print("\n============== RESULTS =================\n")
 		if(self.asmRes):
@@ -34,8 +62,21 @@ class Results:
 		if(self.simRes):
 			print("Simulator ===>")
 			self.declareARes(self.simRes)
+		if(self.stats):
+			self.declareStats()
+
+	def writeJson(self, path):
+		# Marks and timing of the run as JSON
+		marks = {}
+		for tool, res in (("Assembler", self.asmRes), ("Simulator", self.simRes)):
+			if res:
+				marks[tool] = [{"suite": suite[0], "passed": suite[1], "total": suite[2],
+								"marks": suite[1] * suite[-1], "outOf": suite[2] * suite[-1]} for suite in res]
+		with open(path, "w") as f:
+			json.dump({"marks": marks, "stats": self.stats or {}}, f, indent=2)
 
-	def __init__(self, verb, asmRes, simRes):
+	def __init__(self, verb, asmRes, simRes, stats=None):
 		self.VERBOSE = verb
 		self.asmRes = asmRes
-		self.simRes = simRes
\ No newline at end of file
+		self.simRes = simRes
+		self.stats = stats
\ No newline at end of file
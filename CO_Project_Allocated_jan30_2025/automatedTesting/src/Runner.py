@@ -0,0 +1,299 @@
+# Execution backends for the graders
+
+import asyncio
+import contextlib
+import importlib.util
+import io
+import os
+import signal
+import subprocess
+import sys
+import sysconfig
+import time
+import traceback
+import types
+from collections import namedtuple
+
+try:
+	import resource
+except ImportError:
+	# not available on Windows; runs there are neither limited nor accounted
+	resource = None
+
+# Directories of the standard library and of installed packages. Modules
+# imported from there stay loaded between runs; every other module a script
+# imports (its own helpers, its isa.py) is forgotten after the run.
+INSTALLED_DIRS = tuple(os.path.join(os.path.realpath(sysconfig.get_path(name)), "")
+					   for name in ("stdlib", "platstdlib", "purelib", "platlib"))
+
+def forgetModules(before):
+	# Removes from sys.modules the modules imported since the snapshot
+	# before (a set of module names) that are not part of the Python
+	# installation, so the next script imports its own copies
+	for name in set(sys.modules) - before:
+		path = getattr(sys.modules[name], "__file__", None)
+		if path is not None and not os.path.realpath(path).startswith(INSTALLED_DIRS):
+			del sys.modules[name]
+
+class ScriptRunner:
+	# Runs a submission's Assembler.py / Simulator.py inside the grader's
+	# process. The script is compiled once with importlib; every run executes
+	# it as __main__ in a fresh module namespace with a patched sys.argv, so
+	# no new Python interpreter is started per test. Like a subprocess it
+	# runs in the script's own directory, and the modules it imports are
+	# removed from sys.modules afterwards, so every run imports them afresh.
+
+	def __init__(self, path, code):
+		self.path = path
+		self.code = code
+
+	@classmethod
+	def load(cls, path):
+		# Returns None if the script cannot be compiled, in which case the
+		# grader falls back to running it as a subprocess
+		path = os.path.abspath(path)
+		try:
+			spec = importlib.util.spec_from_file_location("__main__", path)
+			code = spec.loader.get_code("__main__")
+		except Exception:
+			return None
+		return cls(path, code)
+
+	def run(self, args):
+		# Runs the script with sys.argv = [script] + args. Returns the exit
+		# code and everything it wrote to stdout and stderr.
+		module = types.ModuleType("__main__")
+		module.__file__ = self.path
+		output = io.StringIO()
+		savedArgv = sys.argv
+		savedPath = sys.path[:]
+		savedMain = sys.modules["__main__"]
+		savedModules = set(sys.modules)
+		savedCwd = os.getcwd()
+		sys.argv = [self.path] + list(args)
+		sys.path.insert(0, os.path.dirname(self.path))
+		sys.modules["__main__"] = module
+		exitCode = 0
+		try:
+			os.chdir(os.path.dirname(self.path))
+			with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+				try:
+					exec(self.code, module.__dict__)
+				except SystemExit as e:
+					if e.code is None:
+						exitCode = 0
+					elif isinstance(e.code, int):
+						exitCode = e.code
+					else:
+						print(e.code, file=sys.stderr)
+						exitCode = 1
+				except Exception:
+					traceback.print_exc()
+					exitCode = 1
+		finally:
+			sys.argv = savedArgv
+			sys.path[:] = savedPath
+			sys.modules["__main__"] = savedMain
+			forgetModules(savedModules)
+			os.chdir(savedCwd)
+		return exitCode, output.getvalue()
+
+def importScript(name, path):
+	# Imports the tool at path as a module called name. Its own directory is
+	# searched first, so it gets the isa.py shipped next to it; the modules
+	# it imports are taken off sys.modules again, so the next tool imported
+	# gets its own copies.
+	directory = os.path.dirname(os.path.abspath(path))
+	savedPath = sys.path[:]
+	savedModules = set(sys.modules)
+	sys.path.insert(0, directory)
+	try:
+		spec = importlib.util.spec_from_file_location(name, path)
+		module = importlib.util.module_from_spec(spec)
+		spec.loader.exec_module(module)
+	finally:
+		sys.path[:] = savedPath
+		forgetModules(savedModules)
+	return module
+
+# Outcome of one run: OK, CRASH (non-zero exit status), TIMEOUT (killed)
+# or LIMIT (stopped by a resource limit)
+OK = "ok"
+CRASH = "crash"
+TIMEOUT = "timeout"
+LIMIT = "limit"
+
+# Resource limits for subprocess runs; None leaves that resource unlimited.
+# cpu is in seconds, memory (address space) and fsize in bytes.
+Limits = namedtuple("Limits", ["cpu", "memory", "fsize"])
+NO_LIMITS = Limits(None, None, None)
+
+# Accounting for one run: CPU seconds (user + system), peak RSS in
+# kilobytes, the name of the limit it hit, if any, and wall clock seconds.
+# cpu and rss are None where they cannot be measured for a single run.
+Usage = namedtuple("Usage", ["cpu", "rss", "limit", "wall"])
+
+def cpuSeconds(who):
+	# who is resource.RUSAGE_SELF or RUSAGE_CHILDREN, None without resource
+	if who is None:
+		return None
+	usage = resource.getrusage(who)
+	return usage.ru_utime + usage.ru_stime
+
+def runScript(runner, path, args):
+	# Runs the script at path with args, in this process when a runner could
+	# be loaded for it, else as a subprocess. Returns (outcome, output, usage).
+	# The CPU time is this process's or the children's rusage delta; the peak
+	# RSS of a single run is not known here.
+	who = None
+	if resource is not None:
+		who = resource.RUSAGE_CHILDREN if runner is None else resource.RUSAGE_SELF
+	cpuBefore = cpuSeconds(who)
+	start = time.perf_counter_ns()
+	if runner is None:
+		result = subprocess.run([sys.executable, path] + list(args), cwd=os.path.dirname(path),
+								stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+		exitCode, output = result.returncode, result.stdout
+	else:
+		exitCode, output = runner.run(args)
+	wall = (time.perf_counter_ns() - start) / 1e9
+	cpu = None if cpuBefore is None else cpuSeconds(who) - cpuBefore
+	return (OK if exitCode == 0 else CRASH), output, Usage(cpu, None, None, wall)
+
+# Process pool workers load the script once and reuse it for every test
+# they are handed
+workerPath = None
+workerRunner = None
+
+def initWorker(path):
+	global workerPath, workerRunner
+	workerPath = path
+	workerRunner = ScriptRunner.load(path)
+
+def runInWorker(args):
+	return runScript(workerRunner, workerPath, args)
+
+# Subprocess orchestrator used when a per-test timeout or resource limits
+# are set. A script running in this process cannot be stopped, so every run
+# is a separate process started with asyncio; at most `jobs` run at once and
+# one that outlives its timeout is killed. stdout and stderr are written to
+# the run's log file as they arrive.
+#
+# Where the resource module exists the script is started through this file
+# (see launch() below), which applies the limits to the script and reports
+# its exact CPU time and peak RSS from wait4() back over a pipe.
+
+def applyLimits(limits):
+	# preexec_fn of a limited child. SIGXCPU at the soft CPU limit, SIGKILL a
+	# second later.
+	if limits.cpu is not None:
+		resource.setrlimit(resource.RLIMIT_CPU, (limits.cpu, limits.cpu + 1))
+	if limits.memory is not None:
+		resource.setrlimit(resource.RLIMIT_AS, (limits.memory, limits.memory))
+	if limits.fsize is not None:
+		resource.setrlimit(resource.RLIMIT_FSIZE, (limits.fsize, limits.fsize))
+
+def launch(args):
+	# python3 Runner.py usage_fd cpu memory fsize script [args...]
+	# Limits are numbers or "-". Runs the script under the limits and writes
+	# "exit_status cpu_seconds peak_rss_kb" to usage_fd.
+	usageFd = int(args[0])
+	limits = Limits(*[None if value == "-" else int(value) for value in args[1:4]])
+	process = subprocess.Popen(args[4:], preexec_fn=lambda: applyLimits(limits))
+	_, status, usage = os.wait4(process.pid, 0)
+	process.returncode = os.waitstatus_to_exitcode(status)
+	with os.fdopen(usageFd, "w") as f:
+		f.write(f"{process.returncode} {usage.ru_utime + usage.ru_stime} {usage.ru_maxrss}\n")
+	sys.exit(process.returncode if process.returncode >= 0 else 128 - process.returncode)
+
+def limitHit(returnCode, output, limits):
+	# Name of the limit that stopped a run, or None. Python ignores SIGXFSZ
+	# and turns a failed allocation into MemoryError, so those two show up
+	# in the output rather than as a signal.
+	if limits.cpu is not None and returnCode in (-signal.SIGXCPU, -signal.SIGKILL):
+		return "cpu"
+	if limits.memory is not None and ("MemoryError" in output or "Cannot allocate memory" in output):
+		return "memory"
+	if limits.fsize is not None and "[Errno 27]" in output:
+		return "file size"
+	return None
+
+def readUsage(usageRead, output, limits, wall):
+	with os.fdopen(usageRead, "r") as f:
+		report = f.read().split()
+	if not report:
+		return None, Usage(None, None, None, wall)      # the launcher was killed
+	returnCode = int(report[0])
+	return returnCode, Usage(float(report[1]), int(report[2]), limitHit(returnCode, output, limits), wall)
+
+async def pumpStream(stream, chunks, log):
+	async for line in stream:
+		text = line.decode(errors="replace")
+		chunks.append(text)
+		log.write(text)
+		log.flush()
+
+def killProcess(process, group):
+	try:
+		if group:
+			os.killpg(process.pid, signal.SIGKILL)
+		else:
+			process.kill()
+	except ProcessLookupError:
+		pass
+
+async def runProcess(path, args, timeout, limits, logPath, semaphore):
+	async with semaphore:
+		command = [sys.executable, path] + list(args)
+		options = {}
+		usageRead = None
+		if resource is not None:
+			usageRead, usageWrite = os.pipe()
+			command = [sys.executable, os.path.abspath(__file__), str(usageWrite)] + \
+					  ["-" if value is None else str(value) for value in limits] + command
+			# own session, so a timeout kills the launcher and the script together
+			options = {"pass_fds": (usageWrite,), "start_new_session": True}
+		start = time.perf_counter_ns()
+		process = await asyncio.create_subprocess_exec(*command, cwd=os.path.dirname(path),
+													   stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+													   **options)
+		if usageRead is not None:
+			os.close(usageWrite)
+		chunks = []
+		outcome = None
+		os.makedirs(os.path.dirname(logPath), exist_ok=True)
+		with open(logPath, "w") as log:
+			try:
+				await asyncio.wait_for(asyncio.gather(pumpStream(process.stdout, chunks, log),
+													  pumpStream(process.stderr, chunks, log),
+													  process.wait()), timeout)
+			except asyncio.TimeoutError:
+				killProcess(process, usageRead is not None)
+				await process.wait()
+				outcome = TIMEOUT
+		wall = (time.perf_counter_ns() - start) / 1e9
+	output = "".join(chunks)
+	returnCode, usage = process.returncode, Usage(None, None, None, wall)
+	if usageRead is not None:
+		reported, usage = readUsage(usageRead, output, limits, wall)
+		if reported is not None:
+			returnCode = reported
+	if outcome is None:
+		if usage.limit is not None:
+			outcome = LIMIT
+		else:
+			outcome = OK if returnCode == 0 else CRASH
+	return outcome, output, usage
+
+async def runProcesses(path, argLists, jobs, timeout, limits, logPaths):
+	semaphore = asyncio.Semaphore(jobs)
+	return await asyncio.gather(*[runProcess(path, args, timeout, limits, logPath, semaphore)
+								  for args, logPath in zip(argLists, logPaths)])
+
+def runScriptsAsync(path, argLists, jobs, timeout, logPaths, limits=NO_LIMITS):
+	# Returns (outcome, output, usage) per argument list, in order. usage.cpu
+	# and usage.rss are None where the platform cannot account for a run.
+	return asyncio.run(runProcesses(path, argLists, jobs, timeout, limits, logPaths))
+
+if __name__ == "__main__":
+	launch(sys.argv[1:])
@@ -0,0 +1,149 @@
+# Register-level comparison of simulator traces
+
+import itertools
+from collections import deque, namedtuple
+
+try:
+	import numpy as np
+except ImportError:
+	# the comparison falls back to plain Python loops
+	np = None
+
+# Columns of a register line: the PC after the step, then x0-x31
+COLUMNS = ["PC"] + ["x" + str(i) for i in range(32)]
+
+# Steps of context kept on either side of the first divergence
+CONTEXT = 3
+
+# Row pairs buffered per mismatch count once past the context window, so
+# the counts are taken a block at a time (with NumPy where available) in
+# constant memory
+BLOCK_ROWS = 4096
+
+# firstStep: 1-based step of the first differing register line, or None
+# registers: names of the columns that differ at firstStep
+# context: [(step, generated row, expected row)] around firstStep; a row is
+#   None where that trace has already ended
+# counts: {column: number of steps at which it differs} over the steps both traces have
+# generatedSteps, expectedSteps: number of register lines in each trace
+# memory: [(address, generated, expected)] for every differing memory word
+TraceComparison = namedtuple("TraceComparison", ["firstStep", "registers", "context", "counts", "generatedSteps",
+												 "expectedSteps", "memory"])
+
+def parseValue(token):
+	# "0b..." binary or decimal (the _r format), as an unsigned 32-bit value
+	if token.startswith("0b"):
+		return int(token[2:], 2) & 0xFFFFFFFF
+	return int(token) & 0xFFFFFFFF
+
+def parseTrace(lines, memory):
+	# Yields the register rows of a trace one at a time and fills memory
+	# {address: value} from the dump at its end. Raises ValueError for a
+	# line that is neither.
+	for lineNum, line in enumerate(lines, 1):
+		line = line.strip()
+		if line == "":
+			continue
+		if ":" in line:
+			address, value = line.split(":", 1)
+			memory[int(address, 16)] = parseValue(value.strip())
+			continue
+		row = [parseValue(token) for token in line.split()]
+		if len(row) != len(COLUMNS):
+			raise ValueError("line " + str(lineNum) + " has " + str(len(row)) + " values, expected " + str(len(COLUMNS)))
+		yield row
+
+def differingColumns(generated, expected):
+	return [COLUMNS[c] for c, (a, b) in enumerate(zip(generated, expected)) if a != b]
+
+def countMismatches(pairs, counts):
+	# Adds to counts[c] the number of (generated, expected) row pairs whose
+	# column c differs
+	if not pairs:
+		return
+	if np is not None:
+		generated = np.array([pair[0] for pair in pairs], dtype=np.uint32)
+		expected = np.array([pair[1] for pair in pairs], dtype=np.uint32)
+		for column, count in enumerate((generated != expected).sum(axis=0).tolist()):
+			counts[column] += count
+		return
+	for generated, expected in pairs:
+		if generated != expected:
+			for column, (a, b) in enumerate(zip(generated, expected)):
+				if a != b:
+					counts[column] += 1
+
+def compareMemory(generated, expected):
+	addresses = sorted(set(generated) | set(expected))
+	return [(address, generated.get(address, 0), expected.get(address, 0)) for address in addresses
+			if generated.get(address, 0) != expected.get(address, 0)]
+
+def compareTraces(generatedLines, expectedLines, context=CONTEXT):
+	# Reads both traces in step to their ends. Until the first divergence
+	# only the last `context` rows are kept; the `context` rows after it
+	# complete the report window, and every later row is only counted, a
+	# block at a time. Memory use does not depend on the length of the
+	# traces.
+	generatedMemory = {}
+	expectedMemory = {}
+	before = deque(maxlen=context)
+	window = []
+	firstStep = None
+	registers = []
+	counts = [0] * len(COLUMNS)
+	block = []
+	generatedSteps = 0
+	expectedSteps = 0
+	rows = itertools.zip_longest(parseTrace(generatedLines, generatedMemory), parseTrace(expectedLines, expectedMemory))
+	for step, (generated, expected) in enumerate(rows, 1):
+		if generated is not None:
+			generatedSteps += 1
+		if expected is not None:
+			expectedSteps += 1
+		if firstStep is None:
+			if generated == expected:
+				before.append((step, generated, expected))
+				continue
+			firstStep = step
+			if generated is not None and expected is not None:
+				registers = differingColumns(generated, expected)
+			window = list(before)
+		if step <= firstStep + context:
+			window.append((step, generated, expected))
+		if generated is not None and expected is not None:
+			block.append((generated, expected))
+			if len(block) >= BLOCK_ROWS:
+				countMismatches(block, counts)
+				block = []
+	countMismatches(block, counts)
+	return TraceComparison(firstStep, registers, window, {COLUMNS[c]: n for c, n in enumerate(counts) if n},
+						   generatedSteps, expectedSteps, compareMemory(generatedMemory, expectedMemory))
+
+def formatStep(step, generated, expected):
+	if generated is None:
+		return "  step " + str(step) + ": trace ended, expected PC 0x%08X" % expected[0]
+	if expected is None:
+		return "  step " + str(step) + ": extra step, PC 0x%08X" % generated[0]
+	if generated == expected:
+		return "  step " + str(step) + ": PC 0x%08X" % expected[0]
+	return "  step " + str(step) + ": " + ", ".join(
+		"%s got %d, expected %d" % (COLUMNS[c], a, b) for c, (a, b) in enumerate(zip(generated, expected)) if a != b)
+
+def formatComparison(comparison):
+	# Short human readable summary, one string per line
+	report = []
+	if comparison.generatedSteps != comparison.expectedSteps:
+		report.append("Trace has " + str(comparison.generatedSteps) + " steps, expected " + str(comparison.expectedSteps))
+	if comparison.firstStep is not None:
+		if comparison.registers:
+			report.append("First divergence at step " + str(comparison.firstStep) + ": " + ", ".join(comparison.registers))
+		else:
+			report.append("First divergence at step " + str(comparison.firstStep) + ": missing or extra step")
+	for step, generated, expected in comparison.context:
+		report.append(formatStep(step, generated, expected))
+	if comparison.counts:
+		report.append("Mismatched steps per register: " +
+					  ", ".join(name + "=" + str(count) for name, count in comparison.counts.items()))
+	for address, generated, expected in comparison.memory:
+		report.append("Memory 0x%08X: got %d, expected %d" % (address, generated, expected))
+	return report
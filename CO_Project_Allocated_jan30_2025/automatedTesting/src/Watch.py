@@ -0,0 +1,79 @@
+# Watch mode: re-runs only the tests affected by each change
+
+import glob
+import os
+import time
+from colors import bcolors
+
+# Seconds between two scans
+POLL_INTERVAL = 0.5
+
+def fileState(path):
+	try:
+		st = os.stat(path)
+	except FileNotFoundError:
+		return None
+	return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+class Watcher:
+	# Keeps a map from every test to the files its result depends on: its
+	# input, its golden file and the sources of the tool under test. Each
+	# scan lists the suite directories and stats only those files, so it is
+	# cheap, and the files the graders write never trigger a run. A test is
+	# re-run when one of its files changed (mtime, inode or size) or when it
+	# is new.
+
+	def __init__(self, graders, interval=POLL_INTERVAL):
+		# graders: [(grader, path of the script it tests)]
+		self.graders = graders
+		self.interval = interval
+
+	def dependencies(self):
+		# {(grader index, suite name, test): [files]}
+		deps = {}
+		for index, (grader, script) in enumerate(self.graders):
+			sources = sorted(glob.glob(os.path.join(os.path.dirname(script), "*.py")))
+			for name, inputDir, goldenDir, _ in grader.suites():
+				if not os.path.isdir(inputDir):
+					continue
+				for test in grader.listFiles(inputDir):
+					deps[(index, name, test)] = [os.path.join(inputDir, test), os.path.join(goldenDir, test)] + sources
+		return deps
+
+	def snapshot(self, deps):
+		return {path: fileState(path) for files in deps.values() for path in files}
+
+	def run(self, tests):
+		# Runs the given tests, one handleSuite() call per suite so that each
+		# suite's tests run in parallel
+		suites = {}
+		for index, name, test in tests:
+			suites.setdefault((index, name), set()).add(test)
+		for (index, name), only in sorted(suites.items()):
+			grader = self.graders[index][0]
+			grader.testStats.clear()
+			grader.suiteStats.clear()
+			print(bcolors.OKBLUE + bcolors.BOLD + grader.TOOL + " " + name + bcolors.ENDC)
+			passed, total = grader.handleSuite(name, only)
+			print("Passed " + str(passed) + " of " + str(total) + " re-run tests")
+
+	def watch(self):
+		deps = self.dependencies()
+		state = self.snapshot(deps)
+		self.run(deps.keys())
+		print(bcolors.OKCYAN + "Watching for changes, press Ctrl+C to stop" + bcolors.ENDC)
+		try:
+			while True:
+				time.sleep(self.interval)
+				newDeps = self.dependencies()
+				newState = self.snapshot(newDeps)
+				affected = [key for key, files in newDeps.items()
+							if key not in deps or any(newState[path] != state.get(path) for path in files)]
+				deps, state = newDeps, newState
+				if affected:
+					start = time.perf_counter_ns()
+					self.run(affected)
+					print(bcolors.OKCYAN + "Re-ran " + str(len(affected)) + " tests in %.2fs" %
+						  ((time.perf_counter_ns() - start) / 1e9) + bcolors.ENDC)
+		except KeyboardInterrupt:
+			pass
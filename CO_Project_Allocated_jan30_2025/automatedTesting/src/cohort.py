@@ -0,0 +1,228 @@
+# Grades a whole cohort of submissions in one run
+#
+# Every subdirectory of the submissions directory is one student's copy of
+# the project, holding SimpleAssembler/Assembler.py and/or
+# SimpleSimulator/Simulator.py somewhere below it. Every (submission, test)
+# pair is run as a subprocess in its own temporary directory holding a copy
+# of the tool under test, so submissions never see each other's files or
+# the framework's user_* output directories. Marks are computed as Results
+# does and written for all students to one CSV or JSON file.
+#
+# Fairness: runs are started round-robin over submissions, at most
+# --per-submission of one submission's runs are in flight at once, every
+# run is killed after --timeout seconds, and a submission that has timed out
+# --max-timeouts times has its remaining tests failed without running them.
+# --cpu-limit, --mem-limit and --fsize-limit cap every run as in main.py,
+# and results are cached in automatedTesting/cache/ as in main.py: a test
+# whose input, golden file and submission files are unchanged since an
+# earlier regrade is not run again.
+
+import asyncio
+import csv
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from colors import bcolors
+from AsmGrader import AsmGrader
+from SimGrader import SimGrader
+from Runner import runProcess, Limits, TIMEOUT, LIMIT, NO_LIMITS
+import Runner
+
+JOBS = os.cpu_count() or 1
+PER_SUBMISSION = 2
+TIMEOUT_SECONDS = 10.0
+MAX_TIMEOUTS = 2
+GRADE_ASSEMBLER = True
+GRADE_SIMULATOR = True
+
+def printHelp():
+	print("Usage: python3 src/cohort.py [options] submissions_dir output.csv|output.json")
+	print("--jobs N to run N tests at a time (default: number of CPUs)")
+	print("--per-submission N to run at most N tests of one submission at a time (default 2)")
+	print("--timeout S to kill a test after S seconds (default 10)")
+	print("--max-timeouts K to fail the remaining tests of a submission after K timeouts (default 2)")
+	print("--cpu-limit S, --mem-limit MB, --fsize-limit MB to limit each test's CPU time, memory and")
+	print("    output file size (Linux/macOS only)")
+	print("--no-cache to run every test even if its result is cached")
+	print("--no-asm to not grade assemblers")
+	print("--no-sim to not grade simulators")
+
+def popOption(args, name, convert, default):
+	if name not in args:
+		return default
+	index = args.index(name)
+	try:
+		value = convert(args[index + 1])
+	except (IndexError, ValueError):
+		printHelp()
+		exit()
+	del args[index:index + 2]
+	return value
+
+def findScript(submission, script):
+	# Path of e.g. SimpleSimulator/Simulator.py inside a submission, which
+	# may be nested in extra directories, or None
+	toolDir = os.path.basename(os.path.dirname(script))
+	matches = sorted(glob.glob(os.path.join(submission, "**", toolDir, os.path.basename(script)), recursive=True))
+	return matches[0] if matches else None
+
+class Cohort:
+
+	def __init__(self, submissionsDir, jobs, perSubmission, timeout, maxTimeouts, gradeAssembler, gradeSimulator,
+				 limits=NO_LIMITS, cache=True):
+		self.submissions = sorted(d for d in os.listdir(submissionsDir) if os.path.isdir(os.path.join(submissionsDir, d)))
+		self.submissionsDir = submissionsDir
+		self.jobs = jobs
+		self.perSubmission = perSubmission
+		self.timeout = timeout
+		self.maxTimeouts = maxTimeouts
+		self.tools = []
+		if gradeAssembler:
+			grader = AsmGrader(False, True, "linux", limits=limits, cache=cache)
+			self.tools.append(["Assembler", grader, grader.ASM_SCRIPT])
+		if gradeSimulator:
+			grader = SimGrader(False, True, "linux", limits=limits, cache=cache)
+			self.tools.append(["Simulator", grader, grader.SIM_SCRIPT])
+		self.logDir = os.path.join(AsmGrader.LOG_DIR, "cohort")
+
+	def pairs(self):
+		# (submission, tool, suite, test) in round-robin order: the first test
+		# of every submission, then the second, ...
+		tests = []
+		for tool, grader, script in self.tools:
+			for suite in grader.suites():
+				if os.path.isdir(suite[1]):
+					tests += [(tool, suite[0], test) for test in sorted(grader.listFiles(suite[1]))]
+		return [(submission,) + test for test in tests for submission in self.submissions]
+
+	def prepare(self, workDir, script):
+		# Copies the directory of the submission's script, with the modules it
+		# imports from there, into workDir so that it runs in isolation
+		projectDir = os.path.join(workDir, "project")
+		toolDir = os.path.join(projectDir, os.path.basename(os.path.dirname(script)))
+		shutil.copytree(os.path.dirname(script), toolDir)
+		return os.path.join(toolDir, os.path.basename(script))
+
+	async def runPair(self, pair, tempRoot, semaphore, submissionSemaphores, timeouts):
+		submission, tool, suite, test = pair
+		_, grader, reference = next(t for t in self.tools if t[0] == tool)
+		inputDir, goldenDir = next(s[1:3] for s in grader.suites() if s[0] == suite)
+		script = findScript(os.path.join(self.submissionsDir, submission), reference)
+		if script is None:
+			return False, "missing " + os.path.basename(reference)
+		goldenFile = os.path.join(goldenDir, test)
+		# keyed by the submission's own files, so a hit does not depend on
+		# the temporary copy the test ran in
+		dependencies = [os.path.join(inputDir, test), goldenFile]
+		async with submissionSemaphores[submission]:
+			if timeouts[submission] >= self.maxTimeouts:
+				return False, TIMEOUT
+			workDir = tempfile.mkdtemp(dir=tempRoot)
+			try:
+				outputFile = os.path.join(workDir, test)
+				if grader.cache is not None:
+					cached = grader.cache.load(grader.cache.key(script, dependencies), [outputFile])
+					if cached is not None:
+						return cached[3], cached[0]
+				localScript = self.prepare(workDir, script)
+				args = grader.scriptArgs(os.path.join(inputDir, test), outputFile)
+				logPath = os.path.join(self.logDir, submission, tool, suite, test)
+				outcome, output, usage = await runProcess(localScript, args, self.timeout, grader.limits, logPath,
+														  semaphore)
+				if outcome == TIMEOUT:
+					timeouts[submission] += 1
+					return False, outcome
+				if outcome == LIMIT:
+					return False, LIMIT + ": " + usage.limit
+				try:
+					match = grader.diffFiles(outputFile, goldenFile)
+				except FileNotFoundError:
+					match = grader.diffFiles(outputFile, os.devnull)
+				grader.storeResult(script, dependencies, [outputFile], outcome, output, usage, match)
+				return match, outcome
+			finally:
+				shutil.rmtree(workDir, ignore_errors=True)
+
+	async def runAll(self, pairs, tempRoot):
+		semaphore = asyncio.Semaphore(self.jobs)
+		submissionSemaphores = {s: asyncio.Semaphore(self.perSubmission) for s in self.submissions}
+		timeouts = {s: 0 for s in self.submissions}
+		return await asyncio.gather(*[self.runPair(pair, tempRoot, semaphore, submissionSemaphores, timeouts)
+									  for pair in pairs])
+
+	def grade(self):
+		# Returns one row per student: suite marks, per tool totals and notes
+		pairs = self.pairs()
+		with tempfile.TemporaryDirectory() as tempRoot:
+			results = asyncio.run(self.runAll(pairs, tempRoot))
+
+		counts = {}
+		notes = {s: set() for s in self.submissions}
+		for (submission, tool, suite, test), (match, outcome) in zip(pairs, results):
+			passed, total = counts.get((submission, tool, suite), (0, 0))
+			counts[(submission, tool, suite)] = (passed + (1 if match else 0), total + 1)
+			if outcome == TIMEOUT or outcome.startswith((LIMIT, "missing")):
+				notes[submission].add(outcome)
+
+		rows = []
+		for submission in self.submissions:
+			row = {"student": submission}
+			grandTotal = 0
+			for tool, grader, _ in self.tools:
+				toolTotal = 0
+				for suite in grader.suites():
+					passed, total = counts.get((submission, tool, suite[0]), (0, 0))
+					row[tool + " " + suite[0] + " passed"] = passed
+					row[tool + " " + suite[0] + " tests"] = total
+					row[tool + " " + suite[0] + " marks"] = passed * suite[-1]
+					toolTotal += passed * suite[-1]
+				row[tool + " total"] = toolTotal
+				grandTotal += toolTotal
+			row["total"] = grandTotal
+			row["notes"] = "; ".join(sorted(notes[submission]))
+			rows.append(row)
+		return rows
+
+def writeRows(rows, outputPath):
+	if outputPath.endswith(".json"):
+		with open(outputPath, "w") as f:
+			json.dump(rows, f, indent=2)
+		return
+	with open(outputPath, "w", newline="") as f:
+		writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ["student"])
+		writer.writeheader()
+		writer.writerows(rows)
+
+def main():
+	args = sys.argv[1:]
+	jobs = popOption(args, "--jobs", int, JOBS)
+	perSubmission = popOption(args, "--per-submission", int, PER_SUBMISSION)
+	timeout = popOption(args, "--timeout", float, TIMEOUT_SECONDS)
+	maxTimeouts = popOption(args, "--max-timeouts", int, MAX_TIMEOUTS)
+	megabytes = lambda value: int(float(value) * 1024 * 1024)
+	limits = Limits(popOption(args, "--cpu-limit", int, None), popOption(args, "--mem-limit", megabytes, None),
+					popOption(args, "--fsize-limit", megabytes, None))
+	if limits != NO_LIMITS and Runner.resource is None:
+		print(bcolors.WARNING + "Resource limits are not supported on this system and are ignored" + bcolors.ENDC)
+	gradeAssembler = "--no-asm" not in args
+	gradeSimulator = "--no-sim" not in args
+	cache = "--no-cache" not in args
+	args = [arg for arg in args if arg not in ("--no-asm", "--no-sim", "--no-cache")]
+	if len(args) != 2 or not os.path.isdir(args[0]):
+		printHelp()
+		exit()
+
+	cohort = Cohort(args[0], jobs, perSubmission, timeout, maxTimeouts, gradeAssembler, gradeSimulator, limits, cache)
+	rows = cohort.grade()
+	writeRows(rows, args[1])
+	for row in rows:
+		print(row["student"] + ": " + bcolors.OKGREEN + str(row["total"]) + bcolors.ENDC +
+			  (" (" + row["notes"] + ")" if row["notes"] else ""))
+	print("Marks written to " + args[1])
+
+if __name__ == '__main__':
+	main()
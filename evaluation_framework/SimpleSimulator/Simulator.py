@@ -1,5 +1,12 @@
+import array
+import bisect
+import itertools
+import mmap
+import os
 import sys
 
+import isa
+
 memory_keys = [
     "0x00010000", "0x00010004", "0x00010008", "0x0001000C",
     "0x00010010", "0x00010014", "0x00010018", "0x0001001C",
@@ -11,96 +18,6 @@ memory_keys = [
     "0x00010070", "0x00010074", "0x00010078", "0x0001007C"
 ]
 
-def parse_instruction(binary_str):
-    if len(binary_str) != 32:
-        return "Error: Instruction must be 32 bits long"
-    
-    opcode = binary_str[25:32]
-    instruction = {}
-    
-    if opcode == "0110011":
-        instruction["type"] = "R"
-        instruction["opcode"] = opcode
-        instruction["funct7"] = binary_str[0:7]
-        instruction["rs2"] = binary_str[7:12]
-        instruction["rs1"] = binary_str[12:17]
-        instruction["funct3"] = binary_str[17:20]
-        instruction["rd"] = binary_str[20:25]
-        funct7_funct3 = instruction["funct7"] + instruction["funct3"]
-        r_ops = {
-            "0000000000": "add", "0100000000": "sub", "0000000111": "and",
-            "0000000110": "or", "0000000010": "slt","0000000101": "srl"
-        }
-        instruction["operation"] = r_ops.get(funct7_funct3, "unknown")
-
-    elif opcode == "0000001":  # Halt instruction
-        instruction["type"] = "SP"
-        instruction["operation"] = "hlt"
-        instruction["opcode"] = opcode
-
-    elif opcode == "0000111":  # Reset instruction
-        instruction["type"] = "SP"
-        instruction["operation"] = "rst"
-        instruction["opcode"] = opcode
-    
-    elif opcode in ["0010011", "0000011", "1100111"]:
-        instruction["type"] = "I"
-        instruction["opcode"] = opcode
-        instruction["imm"] = binary_str[0:12]
-        instruction["rs1"] = binary_str[12:17]
-        instruction["funct3"] = binary_str[17:20]
-        instruction["rd"] = binary_str[20:25]
-        i_ops = {"0010011000": "addi", "0000011010": "lw", "1100111000": "jalr"}
-        key = opcode + instruction["funct3"]
-        instruction["operation"] = i_ops.get(key, "unknown")
-
-    elif opcode == "0100011":
-        instruction["type"] = "S"
-        instruction["imm11_5"] = binary_str[0:7]
-        instruction["rs2"] = binary_str[7:12]
-        instruction["rs1"] = binary_str[12:17]
-        instruction["funct3"] = binary_str[17:20]
-        instruction["imm4_0"] = binary_str[20:25]
-        instruction["imm"] = instruction["imm11_5"] + instruction["imm4_0"]
-        s_ops = {"010": "sw"}
-        instruction["operation"] = s_ops.get(instruction["funct3"], "unknown")
-
-    elif opcode == "1100011":
-        instruction["type"] = "B"
-        instruction["imm12"] = binary_str[0:1]
-        instruction["imm10_5"] = binary_str[1:7]
-        instruction["rs2"] = binary_str[7:12]
-        instruction["rs1"] = binary_str[12:17]
-        instruction["funct3"] = binary_str[17:20]
-        instruction["imm4_1"] = binary_str[20:24]
-        instruction["imm11"] = binary_str[24:25]
-        instruction["imm"] = instruction["imm12"] + instruction["imm11"] + instruction["imm10_5"] + instruction["imm4_1"] + "0"
-        b_ops = {"000": "beq", "001": "bne"}
-        instruction["operation"] = b_ops.get(instruction["funct3"], "unknown")
-    
-    elif opcode == "1101111":
-        instruction["type"] = "J"
-        instruction["imm20"] = binary_str[0:1]
-        instruction["imm10_1"] = binary_str[1:11]
-        instruction["imm11"] = binary_str[11:12]
-        instruction["imm19_12"] = binary_str[12:20]
-        instruction["rd"] = binary_str[20:25]
-        instruction["imm"] = (instruction["imm20"] + instruction["imm19_12"] + 
-                            instruction["imm11"] + instruction["imm10_1"]) + "0"
-        instruction["operation"] = "jal"
-
-    else:
-        return "Error: Unknown instruction type"
-    return instruction
-
-def read_from_file(path):
-    instr = []
-    with open(path, "r") as file:
-        lines = file.readlines()
-    for line in lines:
-        instr.append(line.strip())
-    return instr
-
 def sign_extend(val, bits):
     sign_bit = 1 << (bits - 1)
     return (val & (sign_bit - 1)) - (val & sign_bit)
@@ -110,106 +27,434 @@ def _32bit_twos_complement(val):
         val = (1 << 32) + val
     return format(val & 0xFFFFFFFF, '032b')
 
+def _signed(val):
+    return sign_extend(val & 0xFFFFFFFF, 32)
+
+def _div(a, b):
+    a, b = _signed(a), _signed(b)
+    if b == 0: return -1
+    q = abs(a) // abs(b)
+    return -q if (a < 0) != (b < 0) else q
+
+def _rem(a, b):
+    a, b = _signed(a), _signed(b)
+    if b == 0: return a
+    return a - b * _div(a, b)
+
+def _divu(a, b):
+    a, b = a & 0xFFFFFFFF, b & 0xFFFFFFFF
+    return a // b if b else 0xFFFFFFFF
+
+def _remu(a, b):
+    a, b = a & 0xFFFFFFFF, b & 0xFFFFFFFF
+    return a % b if b else a
+
+alu_ops = {
+    "add": lambda a, b: a + b,
+    "sub": lambda a, b: a - b,
+    "sll": lambda a, b: a << (b & 0x1F),
+    "slt": lambda a, b: 1 if _signed(a) < _signed(b) else 0,
+    "sltu": lambda a, b: 1 if (a & 0xFFFFFFFF) < (b & 0xFFFFFFFF) else 0,
+    "xor": lambda a, b: a ^ b,
+    "srl": lambda a, b: a >> (b & 0x1F),
+    "sra": lambda a, b: _signed(a) >> (b & 0x1F),
+    "or": lambda a, b: a | b,
+    "and": lambda a, b: a & b,
+    "mul": lambda a, b: a * b,
+    "mulh": lambda a, b: (_signed(a) * _signed(b)) >> 32,
+    "mulhsu": lambda a, b: (_signed(a) * (b & 0xFFFFFFFF)) >> 32,
+    "mulhu": lambda a, b: ((a & 0xFFFFFFFF) * (b & 0xFFFFFFFF)) >> 32,
+    "div": _div,
+    "divu": _divu,
+    "rem": _rem,
+    "remu": _remu,
+}
+# Register-immediate instructions share the ALU with their register forms
+alu_ops.update({
+    "addi": alu_ops["add"], "slti": alu_ops["slt"], "sltiu": alu_ops["sltu"],
+    "xori": alu_ops["xor"], "ori": alu_ops["or"], "andi": alu_ops["and"],
+    "slli": alu_ops["sll"], "srli": alu_ops["srl"], "srai": alu_ops["sra"],
+})
+
+branch_ops = {
+    "beq": lambda a, b: a == b,
+    "bne": lambda a, b: a != b,
+    "blt": lambda a, b: _signed(a) < _signed(b),
+    "bge": lambda a, b: _signed(a) >= _signed(b),
+    "bltu": lambda a, b: (a & 0xFFFFFFFF) < (b & 0xFFFFFFFF),
+    "bgeu": lambda a, b: (a & 0xFFFFFFFF) >= (b & 0xFFFFFFFF),
+}
+
+reg_names = [f"x{i}" for i in range(32)]
+
+def decode_i_imm(word):
+    return sign_extend(word >> 20, 12)
+
+def decode_s_imm(word):
+    return sign_extend(((word >> 25) << 5) | ((word >> 7) & 0x1F), 12)
+
+def decode_b_imm(word):
+    imm = (((word >> 31) & 0x1) << 12) | (((word >> 7) & 0x1) << 11) | \
+          (((word >> 25) & 0x3F) << 5) | (((word >> 8) & 0xF) << 1)
+    return sign_extend(imm, 13)
+
+def decode_u_imm(word):
+    return word & 0xFFFFF000
+
+def decode_j_imm(word):
+    imm = (((word >> 31) & 0x1) << 20) | (((word >> 12) & 0xFF) << 12) | \
+          (((word >> 20) & 0x1) << 11) | (((word >> 21) & 0x3FF) << 1)
+    return sign_extend(imm, 21)
+
+def decode_no_imm(word):
+    return 0
+
 def execute_r_type(instruction, registers, pc):
-    rs1 = f"x{int(instruction['rs1'], 2)}"
-    rs2 = f"x{int(instruction['rs2'], 2)}"
-    rd = f"x{int(instruction['rd'], 2)}"
-    operation = instruction["operation"]
-    val1 = registers[rs1] if rs1 != "x0" else 0
-    val2 = registers[rs2] if rs2 != "x0" else 0
-    
-    if operation == "add": result = val1 + val2
-    elif operation == "sub": result = val1 - val2
-    elif operation == "and": result = val1 & val2
-    elif operation == "or": result = val1 | val2
-    elif operation == "slt": result = 1 if val1 < val2 else 0
-    elif operation == "srl": result = val1 >> (val2 & 0x1F)
-    else: return pc + 4
-    
-    if rd != "x0": 
+    rd = instruction["rd"]
+    result = alu_ops[instruction["operation"]](registers[instruction["rs1"]], registers[instruction["rs2"]])
+    if rd != "x0":
         registers[rd] = result & 0xFFFFFFFF
     return pc + 4
 
 def execute_i_type(instruction, registers, pc):
-    rs1 = f"x{int(instruction['rs1'], 2)}"
-    rd = f"x{int(instruction['rd'], 2)}"
-    imm = sign_extend(int(instruction["imm"], 2), 12)
+    rd = instruction["rd"]
+    imm = instruction["imm"]
     operation = instruction["operation"]
-    val1 = registers.get(rs1, 0) if rs1 != "x0" else 0
+    val1 = registers[instruction["rs1"]]
 
-    if operation == "addi":
-        result = val1 + imm
-        if rd != "x0": registers[rd] = result & 0xFFFFFFFF
-        return pc + 4
-    elif operation == "lw":
+    if operation == "lw":
         address = (val1 + imm) & 0xFFFFFFFF
         result = memory.get(address, 0)
         if rd != "x0": registers[rd] = result & 0xFFFFFFFF
         return pc + 4
     elif operation == "jalr":
-        if rd != "x0": 
+        if rd != "x0":
             registers[rd] = pc + 4
         return (val1 + imm) & (~1)
+    result = alu_ops[operation](val1, imm)
+    if rd != "x0": registers[rd] = result & 0xFFFFFFFF
+    return pc + 4
 
 def execute_s_type(instruction, registers, pc):
-    rs1 = f"x{int(instruction['rs1'], 2)}"
-    rs2 = f"x{int(instruction['rs2'], 2)}"
-    imm = sign_extend(int(instruction["imm"], 2), 12)
-    operation = instruction["operation"]
-    base = registers[rs1] if rs1 != "x0" else 0
-    val = registers[rs2] if rs2 != "x0" else 0
-    
-    if operation == "sw":
-        address = base + imm
-        memory[address] = val & 0xFFFFFFFF
-        return pc + 4
+    base = registers[instruction["rs1"]]
+    val = registers[instruction["rs2"]]
+    address = base + instruction["imm"]
+    memory[address] = val & 0xFFFFFFFF
     return pc + 4
 
 def execute_b_type(instruction, registers, pc):
-    rs1 = f"x{int(instruction['rs1'], 2)}"
-    rs2 = f"x{int(instruction['rs2'], 2)}"
-    imm = sign_extend(int(instruction["imm"], 2), 13)
+    rs1 = instruction["rs1"]
+    rs2 = instruction["rs2"]
+    imm = instruction["imm"]
     operation = instruction["operation"]
-    val1 = registers[rs1] if rs1 != "x0" else 0
-    val2 = registers[rs2] if rs2 != "x0" else 0
 
     if operation == "beq" and rs1 == "x0" and rs2 == "x0" and imm == 0:
         return pc
-    if operation == "beq" and val1 == val2: 
-        return pc + (imm << 1)
-    elif operation == "bne" and val1 != val2: 
-        return pc + (imm)
+    if branch_ops[operation](registers[rs1], registers[rs2]):
+        return pc + imm
+    return pc + 4
+
+def execute_u_type(instruction, registers, pc):
+    rd = instruction["rd"]
+    result = instruction["imm"]
+    if instruction["operation"] == "auipc":
+        result += pc
+    if rd != "x0": registers[rd] = result & 0xFFFFFFFF
     return pc + 4
 
 def execute_j_type(instruction, registers, pc):
-    rd = f"x{int(instruction['rd'], 2)}"
-    imm = sign_extend(int(instruction["imm"], 2), 21)
-    if instruction["operation"] == "jal":
-        if rd != "x0": registers[rd] = pc + 4
-        return pc + (imm)
+    rd = instruction["rd"]
+    if rd != "x0": registers[rd] = pc + 4
+    return pc + instruction["imm"]
+
+def execute_sp_type(instruction, registers, pc):
+    if instruction["operation"] == "halt":
+        return -1  # Halt execution
+    for reg in registers:
+        if reg != "x0":
+            registers[reg] = 0
     return pc + 4
 
+formats = {
+    "R": (decode_no_imm, execute_r_type),
+    "I": (decode_i_imm, execute_i_type),
+    "IL": (decode_i_imm, execute_i_type),
+    "IS": (decode_i_imm, execute_i_type),
+    "S": (decode_s_imm, execute_s_type),
+    "B": (decode_b_imm, execute_b_type),
+    "U": (decode_u_imm, execute_u_type),
+    "J": (decode_j_imm, execute_j_type),
+    "SP": (decode_no_imm, execute_sp_type),
+}
+
+# (opcode, funct3, funct7) -> (operation, type, immediate decoder, handler)
+decode_table = {}
+for key, operation in isa.DECODE.items():
+    fmt = isa.ENCODINGS[operation]["format"]
+    decode_table[key] = (operation, fmt) + formats[fmt]
+
+def parse_instruction(binary_str):
+    if len(binary_str) != 32:
+        return "Error: Instruction must be 32 bits long"
+
+    try:
+        word = int(binary_str, 2)
+    except ValueError:
+        return "Error: Unknown instruction type"
+    return decode_word(word)
+
+def decode_word(word):
+    entry = decode_table.get((word & 0x7F, (word >> 12) & 0x7, word >> 25))
+    if entry is None:
+        return "Error: Unknown instruction type"
+    operation, fmt, decode_imm, handler = entry
+    return {
+        "type": fmt,
+        "operation": operation,
+        "handler": handler,
+        "rd": reg_names[(word >> 7) & 0x1F],
+        "rs1": reg_names[(word >> 15) & 0x1F],
+        "rs2": reg_names[(word >> 20) & 0x1F],
+        "imm": decode_imm(word),
+    }
+
+def read_from_file(path):
+    instr = []
+    with open(path, "r") as file:
+        lines = file.readlines()
+    for line in lines:
+        instr.append(line.strip())
+    return instr
+
+# Machine code file formats, matching Assembler.py --format
+TEXT_FORMAT = "text"    # one 32-character binary string per line
+HEX_FORMAT = "hex"      # one 8-digit hex word per line, optionally 0x-prefixed
+BIN_FORMAT = "bin"      # raw little-endian 32-bit words
+
+HEX_DIGITS = frozenset(b"0123456789abcdefABCDEF")
+PRINTABLE = frozenset(range(0x20, 0x7F)) | frozenset(b"\t\r\n")
+# array typecode of an unsigned 32-bit int on this platform
+WORD_TYPECODE = "I" if array.array("I").itemsize == 4 else "L"
+
+def detect_format(path):
+    # A .bin file is a raw image. Otherwise the start of the file decides: a
+    # hex word on the first line means hex, text that is not a hex word
+    # means the binary text format, anything else a raw image.
+    if path.endswith(".bin"):
+        return BIN_FORMAT
+    with open(path, "rb") as f:
+        head = f.read(64)
+    lines = [line.strip() for line in head.splitlines() if line.strip()]
+    first = lines[0] if lines else b""
+    if first[:2] in (b"0x", b"0X"):
+        first = first[2:]
+    if len(first) == 8 and set(first) <= HEX_DIGITS:
+        return HEX_FORMAT
+    if set(head) <= PRINTABLE:
+        return TEXT_FORMAT
+    return BIN_FORMAT
+
+def read_image(path):
+    # Words of a raw little-endian image, copied from a read-only mapping of
+    # the file in one go. A trailing partial word is ignored.
+    words = array.array(WORD_TYPECODE)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        size -= size % 4
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image:
+                words.frombytes(image[:size])
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words
+
+def decode_words(words):
+    # Decodes every distinct word once; equal words share the decoded
+    # instruction, which is never modified
+    decoded = {word: decode_word(word) for word in set(words)}
+    return [decoded[word] for word in words]
+
+def load_hex(path):
+    decoded = {}
+    instructions = []
+    for line in read_from_file(path):
+        try:
+            word = int(line, 16)
+        except ValueError:
+            instructions.append("Error: Invalid hex word")
+            continue
+        if word > 0xFFFFFFFF:
+            instructions.append("Error: Instruction must be 32 bits long")
+            continue
+        if word not in decoded:
+            decoded[word] = decode_word(word)
+        instructions.append(decoded[word])
+    return instructions
+
+def load_program(source):
+    # source is either the path of a machine code file in any of the
+    # formats above, detected from the file, or an iterable of 32-bit words:
+    # an Assembler.AssembledProgram from assemble_source(), or
+    # (word for _, word in Assembler.assemble_stream(f)).
+    # Every instruction is decoded once here instead of on every step.
+    if isinstance(source, str):
+        file_format = detect_format(source)
+        if file_format == BIN_FORMAT:
+            return decode_words(read_image(source))
+        if file_format == HEX_FORMAT:
+            return load_hex(source)
+        return [parse_instruction(line) for line in read_from_file(source)]
+    return [decode_word(word) for word in source]
+
+class SourceMap:
+    # PC -> source attribution, loaded from an assembler listing with
+    # load_listing(). Addresses and label addresses are kept in sorted lists
+    # searched with bisect, so attributing every step of a long trace stays
+    # cheap.
+    def __init__(self, entries):
+        # entries: (address, line number, [labels], source text)
+        entries = sorted(entries)
+        self.addresses = [e[0] for e in entries]
+        self.lines = [e[1] for e in entries]
+        self.sources = [e[3] for e in entries]
+        self.label_addresses = []
+        self.label_names = []
+        for address, _, labels, _ in entries:
+            if labels:
+                self.label_addresses.append(address)
+                self.label_names.append(labels[0])
+
+    def locate(self, pc):
+        # (line number, source text) of the instruction at pc, or None
+        i = bisect.bisect_left(self.addresses, pc)
+        if i == len(self.addresses) or self.addresses[i] != pc:
+            return None
+        return self.lines[i], self.sources[i]
+
+    def label_of(self, pc):
+        # "label" or "label+offset" for the closest label at or before pc
+        i = bisect.bisect_right(self.label_addresses, pc) - 1
+        if i < 0:
+            return None
+        offset = pc - self.label_addresses[i]
+        return self.label_names[i] if offset == 0 else f"{self.label_names[i]}+{offset}"
+
+    def describe(self, pc):
+        text = f"0x{pc & 0xFFFFFFFF:08X}"
+        label = self.label_of(pc)
+        if label is not None:
+            text += f" {label}"
+        location = self.locate(pc)
+        if location is not None:
+            text += f" (line {location[0]}: {location[1]})"
+        return text
+
+def load_listing(path):
+    # Reads the listing written by Assembler.py --listing
+    entries = []
+    with open(path, "r") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            address, _, line_num, labels, source = line.rstrip("\n").split("\t", 4)
+            entries.append((int(address, 16), int(line_num), labels.split(",") if labels else [], source))
+    return SourceMap(entries)
+
+def describe_pc(pc, source_map=None):
+    if source_map is None:
+        return f"0x{pc & 0xFFFFFFFF:08X}"
+    return source_map.describe(pc)
+
+def profile_report(counts, source_map=None, top=10):
+    # Hot-PC report from the pc -> execution count dict filled in by
+    # run_simulator(profile=...)
+    total = sum(counts.values())
+    report = [f"{total} instructions retired, hottest PCs:"]
+    for pc, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:top]:
+        report.append(f"{count:>10} {100 * count / total:5.1f}%  {describe_pc(pc, source_map)}")
+    return "\n".join(report)
+
+def trace_pc(token):
+    # PC column of a trace line: "0b..." in the binary trace, decimal in the
+    # readable one. None for memory dump lines.
+    try:
+        return int(token, 0)
+    except ValueError:
+        pass
+    try:
+        return int(token)
+    except ValueError:
+        return None
+
+def first_divergence(trace_lines, expected_lines):
+    # Compares two register traces step by step. Returns None if they agree,
+    # else (step, pc) where step is 1-based and pc is the address of the
+    # instruction that produced the first differing line, taken from the
+    # expected trace (each line holds the PC after the step). Both arguments
+    # may be open files; they are read in step and only up to the first
+    # difference.
+    trace_lines = (line.split() for line in trace_lines if line.strip())
+    expected_lines = (line.split() for line in expected_lines if line.strip())
+    pc = 0
+    for step, (actual, expected) in enumerate(itertools.zip_longest(trace_lines, expected_lines), 1):
+        if actual != expected:
+            return step, pc
+        line_pc = trace_pc(expected[0])
+        if line_pc is not None:
+            pc = line_pc
+    return None
+
 def execute_instruction(instruction, registers, pc):
     if isinstance(instruction, str): return pc + 4
+    return instruction["handler"](instruction, registers, pc)
 
-    elif instruction["type"] == "R": return execute_r_type(instruction, registers, pc)
-    elif instruction["type"] == "I": return execute_i_type(instruction, registers, pc)
-    elif instruction["type"] == "S": return execute_s_type(instruction, registers, pc)
-    elif instruction["type"] == "B": return execute_b_type(instruction, registers, pc)
-    elif instruction["type"] == "J": return execute_j_type(instruction, registers, pc)
-    
-    elif instruction["opcode"] == "0000001":
-        return -1  # Halt execution
+# Upper bound on the steps execute_program() runs, for programs that never halt
+MAX_STEPS = 1000000
+
+def execute_program(source, max_steps=MAX_STEPS):
+    # Runs a program (anything load_program() accepts) without writing a
+    # trace, stepping exactly as run_simulator() does. Returns the final
+    # registers, the memory and the number of instructions retired.
+    global memory
+    memory = {}
+    regs = {f"x{i}": 0 for i in range(32)}
+    regs["x2"] = 380
+    instructions = load_program(source)
+    pc = 0
+    i = 0
+    retired = 0
+    while 0 <= i < len(instructions) and retired < max_steps:
+        next_pc = execute_instruction(instructions[i], regs, pc)
+        retired += 1
+        if next_pc == -1:
+            break
+        sub = next_pc - pc
+        if sub > 4: i += sub // 4
+        elif sub < 0: i -= abs(sub) // 4
+        else: i += 1
+        pc = next_pc
+    return regs, memory, retired
+
+def compare_programs(original, optimized, max_steps=MAX_STEPS):
+    # Companion check for Assembler.py -O: runs both programs and returns
+    # (final states equal, instructions retired by original, by optimized).
+    # The final PC is not compared as the optimized program is shorter.
+    regs_a, memory_a, retired_a = execute_program(original, max_steps)
+    regs_b, memory_b, retired_b = execute_program(optimized, max_steps)
+    memory_a = {addr: val for addr, val in memory_a.items() if val}
+    memory_b = {addr: val for addr, val in memory_b.items() if val}
+    return regs_a == regs_b and memory_a == memory_b, retired_a, retired_b
 
-    elif instruction["opcode"] == "0000111":
-        for reg in registers:
-            if reg != "x0":
-                registers[reg] = 0
-        return pc+4 
-    elif instruction["opcode"] == "0000000": return -1
-    else: return pc + 4
+def compare_report(equal, retired_a, retired_b):
+    saved = retired_a - retired_b
+    percent = 100 * saved / retired_a if retired_a else 0.0
+    return "\n".join([
+        f"Final state: {'equal' if equal else 'DIFFERS'}",
+        f"Instructions retired: {retired_a} -> {retired_b} ({saved} fewer, {percent:.1f}%)",
+    ])
 
-def run_simulator(input_file, output_file, output_r_file):
+def run_simulator(input_file, output_file, output_r_file, profile=None):
+    # If profile is a dict it is filled with pc -> number of times executed
     global pc, registers, memory
     pc = 0
     registers = {f"x{i}": 0 for i in range(32)}
@@ -252,7 +497,7 @@ def run_simulator(input_file, output_file, output_r_file):
 
     memory = {} 
     
-    instructions = read_from_file(input_file)
+    instructions = load_program(input_file)
     instruction_trace = []
     r_formattrace = [] 
     halt_encountered = False
@@ -262,14 +507,15 @@ def run_simulator(input_file, output_file, output_r_file):
         if halt_encountered: 
             break
         
-        binary_str = instructions[i]
-        parsed_inst = parse_instruction(binary_str)
+        parsed_inst = instructions[i]
         pc1 = pc
+        if profile is not None:
+            profile[pc] = profile.get(pc, 0) + 1
         next_pc = execute_instruction(parsed_inst, registers, pc)
         
         reg_state = {reg: _32bit_twos_complement(val) for reg, val in registers.items()}
         reg_state["PC"] = _32bit_twos_complement(next_pc)
-        instruction_trace.append((f"P{next_pc:02d}", binary_str, reg_state))
+        instruction_trace.append((f"P{next_pc:02d}", parsed_inst, reg_state))
         
         r_state = [int(reg_state["PC"], 2)] 
         for j in range(32):
@@ -314,22 +560,58 @@ def run_simulator(input_file, output_file, output_r_file):
                 f.write(f"{addr}:{val}\n")
 
 if __name__ == "__main__":
-    if len(sys.argv)<3 or len(sys.argv)>4:
-        print("Usage: python3 Simulator.py input_machine_code_path output_trace_path [output_r_path]")
+    args = sys.argv[1:]
+    source_map = None
+    if "--map" in args and args.index("--map") + 1 < len(args):
+        index = args.index("--map")
+        source_map = load_listing(args[index + 1])
+        del args[index:index + 2]
+
+    if args and args[0] == "--first-divergence":
+        if len(args) != 3:
+            print("Usage: python3 Simulator.py [--map listing_path] --first-divergence trace_path expected_trace_path")
+            sys.exit(1)
+        with open(args[1], "r") as trace_file, open(args[2], "r") as expected_file:
+            divergence = first_divergence(trace_file, expected_file)
+        if divergence is None:
+            print("Traces match")
+            sys.exit(0)
+        print(f"First divergence at step {divergence[0]}: {describe_pc(divergence[1], source_map)}")
+        sys.exit(1)
+
+    if args and args[0] == "--compare":
+        if len(args) != 3:
+            print("Usage: python3 Simulator.py --compare original_machine_code_path optimized_machine_code_path")
+            sys.exit(1)
+        equal, retired_a, retired_b = compare_programs(args[1], args[2])
+        print(compare_report(equal, retired_a, retired_b))
+        sys.exit(0 if equal else 1)
+
+    profile = None
+    if "--profile" in args:
+        args.remove("--profile")
+        profile = {}
+
+    if len(args)<2 or len(args)>3:
+        print("Usage: python3 Simulator.py [--profile] [--map listing_path] input_machine_code_path output_trace_path [output_r_path]")
+        print("       python3 Simulator.py [--map listing_path] --first-divergence trace_path expected_trace_path")
+        print("       python3 Simulator.py --compare original_machine_code_path optimized_machine_code_path")
         sys.exit(1)
     
-    input_file=sys.argv[1]
-    output_file=sys.argv[2]
+    input_file=args[0]
+    output_file=args[1]
     
-    if not input_file.endswith('.txt') or not output_file.endswith('.txt'):
-        print("Error: Both input and output files must have .txt extension")
+    if not input_file.endswith(('.txt', '.hex', '.bin')) or not output_file.endswith('.txt'):
+        print("Error: The input file must have a .txt, .hex or .bin extension and the output file .txt")
         sys.exit(1)
     
     output_r_file="output_r.txt"
-    if len(sys.argv)==4:
-        output_r_file=sys.argv[3]
+    if len(args)==3:
+        output_r_file=args[2]
         if not output_r_file.endswith('.txt'):
             print("Error: Output_r file must have .txt extension")
             sys.exit(1)
     
-    run_simulator(input_file, output_file, output_r_file)
+    run_simulator(input_file, output_file, output_r_file, profile)
+    if profile is not None:
+        print(profile_report(profile, source_map))
@@ -0,0 +1,115 @@
+# RISC-V ISA specification shared by SimpleAssembler and SimpleSimulator.
+#
+# An identical copy ships next to each tool, so either directory can be
+# copied into a submission on its own and still import it.
+#
+# Every instruction is described exactly once in SPEC. The lookup tables the
+# two tools use on their hot paths are generated from it at import time:
+#   ENCODINGS: mnemonic -> encoding fields, used by the assembler
+#   DECODE:    (opcode, funct3, funct7) -> mnemonic, used by the simulator
+# Adding an instruction is a one-line change here plus a handler in the tool
+# that needs to understand its semantics.
+
+REGISTERS = {
+    "zero": 0, "ra": 1, "sp": 2, "gp": 3, "tp": 4,
+    "t0": 5, "t1": 6, "t2": 7, "s0": 8, "s1": 9,
+    "a0": 10, "a1": 11, "a2": 12, "a3": 13, "a4": 14,
+    "a5": 15, "a6": 16, "a7": 17, "s2": 18, "s3": 19,
+    "s4": 20, "s5": 21, "s6": 22, "s7": 23, "s8": 24,
+    "s9": 25, "s10": 26, "s11": 27, "t3": 28, "t4": 29,
+    "t5": 30, "t6": 31
+}
+
+# Formats:
+#   R   rd, rs1, rs2
+#   I   rd, rs1, imm
+#   IL  rd, imm(rs1)        (loads)
+#   IS  rd, rs1, shamt      (shifts by immediate, funct7 lives in imm[11:5])
+#   S   rs2, imm(rs1)
+#   B   rs1, rs2, offset
+#   U   rd, imm
+#   J   rd, offset
+#   SP  no operands         (project specific halt/rst)
+#
+# mnemonic, format, opcode, funct3, funct7
+SPEC = [
+    # RV32I register-register
+    ("add", "R", 0b0110011, 0b000, 0b0000000),
+    ("sub", "R", 0b0110011, 0b000, 0b0100000),
+    ("sll", "R", 0b0110011, 0b001, 0b0000000),
+    ("slt", "R", 0b0110011, 0b010, 0b0000000),
+    ("sltu", "R", 0b0110011, 0b011, 0b0000000),
+    ("xor", "R", 0b0110011, 0b100, 0b0000000),
+    ("srl", "R", 0b0110011, 0b101, 0b0000000),
+    ("sra", "R", 0b0110011, 0b101, 0b0100000),
+    ("or", "R", 0b0110011, 0b110, 0b0000000),
+    ("and", "R", 0b0110011, 0b111, 0b0000000),
+
+    # RV32M
+    ("mul", "R", 0b0110011, 0b000, 0b0000001),
+    ("mulh", "R", 0b0110011, 0b001, 0b0000001),
+    ("mulhsu", "R", 0b0110011, 0b010, 0b0000001),
+    ("mulhu", "R", 0b0110011, 0b011, 0b0000001),
+    ("div", "R", 0b0110011, 0b100, 0b0000001),
+    ("divu", "R", 0b0110011, 0b101, 0b0000001),
+    ("rem", "R", 0b0110011, 0b110, 0b0000001),
+    ("remu", "R", 0b0110011, 0b111, 0b0000001),
+
+    # RV32I register-immediate
+    ("addi", "I", 0b0010011, 0b000, None),
+    ("slti", "I", 0b0010011, 0b010, None),
+    ("sltiu", "I", 0b0010011, 0b011, None),
+    ("xori", "I", 0b0010011, 0b100, None),
+    ("ori", "I", 0b0010011, 0b110, None),
+    ("andi", "I", 0b0010011, 0b111, None),
+    ("slli", "IS", 0b0010011, 0b001, 0b0000000),
+    ("srli", "IS", 0b0010011, 0b101, 0b0000000),
+    ("srai", "IS", 0b0010011, 0b101, 0b0100000),
+
+    # Loads, stores and control flow
+    ("lw", "IL", 0b0000011, 0b010, None),
+    ("jalr", "I", 0b1100111, 0b000, None),
+    ("sw", "S", 0b0100011, 0b010, None),
+    ("beq", "B", 0b1100011, 0b000, None),
+    ("bne", "B", 0b1100011, 0b001, None),
+    ("blt", "B", 0b1100011, 0b100, None),
+    ("bge", "B", 0b1100011, 0b101, None),
+    ("bltu", "B", 0b1100011, 0b110, None),
+    ("bgeu", "B", 0b1100011, 0b111, None),
+    ("lui", "U", 0b0110111, None, None),
+    ("auipc", "U", 0b0010111, None, None),
+    ("jal", "J", 0b1101111, None, None),
+
+    # Project specific
+    ("rst", "SP", 0b1110011, 0b001, None),
+    ("halt", "SP", 0b1110011, 0b010, None),
+]
+
+
+def _build_encodings(spec):
+    encodings = {}
+    for mnemonic, fmt, opcode, funct3, funct7 in spec:
+        if mnemonic in encodings:
+            raise ValueError(f"Duplicate mnemonic '{mnemonic}' in ISA spec")
+        encodings[mnemonic] = {"format": fmt, "opcode": opcode, "funct3": funct3, "funct7": funct7}
+    return encodings
+
+
+def _build_decode(spec):
+    # Fields an instruction does not use are expanded over every possible
+    # value so that decoding is always a single dictionary lookup.
+    decode = {}
+    for mnemonic, fmt, opcode, funct3, funct7 in spec:
+        funct3_values = range(8) if funct3 is None else (funct3,)
+        funct7_values = range(128) if funct7 is None else (funct7,)
+        for f3 in funct3_values:
+            for f7 in funct7_values:
+                key = (opcode, f3, f7)
+                if key in decode:
+                    raise ValueError(f"'{mnemonic}' overlaps '{decode[key]}' in ISA spec")
+                decode[key] = mnemonic
+    return decode
+
+
+ENCODINGS = _build_encodings(SPEC)
+DECODE = _build_decode(SPEC)
@@ -3,123 +3,159 @@
 from colors import bcolors
 
 from Grader import Grader
+from Runner import importScript, TIMEOUT, LIMIT, NO_LIMITS
 import os
+import tempfile
 
 class AsmGrader(Grader):
 
+	TOOL = "Assembler"
+
 	# simple test 0.1 x 10
 	SIMPLE_MARKS = 0.2
 	# Hard test 0.2 x 5
 	HARD_MARKS = 0.2
 
 	ASM_ERROR_DIR = "errorGen"
+	# expected diagnostics for the errorGen tests, one "line:column: code: message" per line
+	ASM_ERROR_EXP_DIR = "errorDiag"
 	ASM_HARD_DIR = "hardBin"
 	ASM_SIMPLE_DIR = "simpleBin"
 
 	BIN_HARD_DIR = "bin_h"
 	BIN_SIMPLE_DIR = "bin_s"
 
-	def __init__(self, verb, enable,operating_system):
-		super().__init__(verb, enable,operating_system)
+	def __init__(self, verb, enable,operating_system, jobs=1, timeout=None, limits=NO_LIMITS, cache=True, errorTests=False):
+		super().__init__(verb, enable,operating_system, jobs, timeout, limits, cache)
 		self.enable = enable
 		self.operating_system == operating_system
+		# also run the (unmarked) errorGen tests
+		self.errorTests = errorTests
+
+		self.ASM_RUN_DIR = os.path.join(self.PROJECT_DIR, "SimpleAssembler")
+		self.ASM_SCRIPT = os.path.join(self.ASM_RUN_DIR, "Assembler.py")
 
-		if self.operating_system == 'linux':
-			self.ASM_RUN_DIR = "../SimpleAssembler/"
-		elif self.operating_system == 'windows':
-			self.ASM_RUN_DIR = "..\SimpleAssembler\\"
 
+	def loadAssembler(self):
+		# Imports the Assembler under test into this process. Returns None if it
+		# cannot be imported or has no collect-all-errors mode.
+		try:
+			module = importScript("Assembler", self.ASM_SCRIPT)
+		except Exception:
+			return None
+		if not hasattr(module, "assemble_diagnostics"):
+			return None
+		return module
 
 	def handleErrorGen(self):
-	
-		curDir = os.getcwd()
-		if self.operating_system == 'linux': 
-			tests = self.listFiles("tests/assembly/" + self.ASM_ERROR_DIR) 
-		elif self.operating_system == 'windows':
-			tests = self.listFiles("tests\\assembly\\" + self.ASM_ERROR_DIR) 
-		os.chdir(self.ASM_RUN_DIR)  
 		
+		errorDir = os.path.join(self.TESTS_DIR, "assembly", self.ASM_ERROR_DIR)
+		expDir = os.path.join(self.TESTS_DIR, "assembly", self.ASM_ERROR_EXP_DIR)
+		if not os.path.isdir(errorDir):
+			self.printSev(self.HIGH, bcolors.WARNING + "No error tests in " + errorDir + bcolors.ENDC)
+			return
+		tests = self.listFiles(errorDir)
+		tests.sort()
+
+		assembler = self.loadAssembler()
+		if assembler is None:
+			self.handleErrorGenProcess(tests)
+			return
+
+		# Whole error suite in one process, every error of every test reported
 		for test in tests:
 			self.printSev(self.HIGH, bcolors.OKCYAN + "Running " + test + bcolors.ENDC)
-			python_command = 'python3 Assembler.py'
-			if self.operating_system == 'linux':
-				assembly_file = ' ' + '../automatedTesting/tests/assembly/' + self.ASM_ERROR_DIR + '/' + test
-			elif self.operating_system == 'windows':
-				assembly_file = ' ' + '..\\automatedTesting\\tests\\assembly\\' + self.ASM_ERROR_DIR + '\\' + test
-			
-			# create a temp file
-			if self.operating_system == 'linux':
-				os.system('touch temp_file.txt')
-			elif self.operating_system == 'windows':
-				os.system('cd . > temp_file.txt')	
-
-			machine_code_file = ' ' + 'temp_file.txt'
-			command = python_command + assembly_file + machine_code_file
-			errors = os.popen(command).read()
-			if self.operating_system == 'linux':
-				os.system('rm temp_file.txt')
-			elif self.operating_system == 'windows':
-				os.system('del temp_file.txt')
+			with open(os.path.join(errorDir, test), 'r') as f:
+				diagnostics = assembler.assemble_diagnostics(f.read())
+			errors = [assembler.format_diagnostic(d) for d in diagnostics]
+			for error in errors:
+				self.printSev(self.HIGH, error)
+
+			expFile = os.path.join(expDir, test)
+			if os.path.exists(expFile):
+				with open(expFile, 'r') as f:
+					expected = f.readlines()
+				if self.diff(errors, expected):
+					self.printSev(self.HIGH, bcolors.OKGREEN + "[PASSED]" + bcolors.ENDC + " " + test)
+				else:
+					self.printSev(self.HIGH, bcolors.FAIL + "[FAILED]" + bcolors.ENDC + " " + test)
+			self.printSev(self.HIGH, "============================================\n")
 
+	def handleErrorGenProcess(self, tests):
+		# Fallback for assemblers without assemble_diagnostics: one run per
+		# test, printing whatever the assembler reports
+		errorDir = os.path.join(self.TESTS_DIR, "assembly", self.ASM_ERROR_DIR)
+		with tempfile.TemporaryDirectory() as tempDir:
+			argLists = [[os.path.join(errorDir, test), os.path.join(tempDir, test)] for test in tests]
+			results = self.runScripts(self.ASM_SCRIPT, argLists, self.ASM_ERROR_DIR, tests)
 
+		for test, (outcome, errors, usage) in zip(tests, results):
+			self.printSev(self.HIGH, bcolors.OKCYAN + "Running " + test + bcolors.ENDC)
 			self.printSev(self.HIGH, errors, end="")
+			if outcome == TIMEOUT:
+				self.printSev(self.HIGH, bcolors.WARNING + "[TIMEOUT]" + bcolors.ENDC + " " + test)
+			elif outcome == LIMIT:
+				self.printSev(self.HIGH, bcolors.WARNING + "[LIMIT: " + usage.limit + "]" + bcolors.ENDC + " " + test)
 			self.printSev(self.HIGH, "============================================\n")
 
-		os.chdir(curDir)
-
-	def handleBin(self, genDir, expDir):
+	def suites(self):
+		# [name, input directory, golden directory, marks per test] of each
+		# suite, in the order grade() runs them
+		return [
+				["Simple", os.path.join(self.TESTS_DIR, "assembly", self.ASM_SIMPLE_DIR),
+				 os.path.join(self.TESTS_DIR, "assembly", self.BIN_SIMPLE_DIR), self.SIMPLE_MARKS],
+				["Hard", os.path.join(self.TESTS_DIR, "assembly", self.ASM_HARD_DIR),
+				 os.path.join(self.TESTS_DIR, "assembly", self.BIN_HARD_DIR), self.HARD_MARKS],
+			]
+
+	def scriptArgs(self, inputFile, outputFile):
+		# Command line for one test; the readable output goes next to outputFile
+		return [inputFile, outputFile, os.path.splitext(outputFile)[0] + "_r.txt"]
+
+	def handleBin(self, genDir, expDir, only=None):
 		
 		passCount = 0
 		totalCount = 0
 		
-		curDir = os.getcwd()
-		if self.operating_system == 'linux':
-			tests = self.listFiles("tests/assembly/" + genDir)
-		elif self.operating_system == 'windows':
-			tests = self.listFiles("tests\\assembly\\" + genDir)
+		genPath = os.path.join(self.TESTS_DIR, "assembly", genDir)
+		userPath = os.path.join(self.TESTS_DIR, "assembly", "user_" + expDir)
+		expPath = os.path.join(self.TESTS_DIR, "assembly", expDir)
+		tests = self.listFiles(genPath)
 		tests.sort()
-		os.chdir(self.ASM_RUN_DIR)
-		
+		if only is not None:
+			tests = [test for test in tests if test in only]
+
+		argLists = []
+		dependencies = []
+		outputs = []
 		for test in tests:
+			machine_code_file = os.path.join(userPath, test)
+			machine_code_readable_file = os.path.join(userPath, test.split(".")[0]+"_r.txt")
+			os.remove(machine_code_file) if os.path.exists(machine_code_file) else None; 
+			os.remove(machine_code_readable_file) if os.path.exists(machine_code_readable_file) else None;
+			argLists.append(self.scriptArgs(os.path.join(genPath, test), machine_code_file))
+			dependencies.append([os.path.join(genPath, test), os.path.join(expPath, test)])
+			outputs.append([machine_code_file, machine_code_readable_file])
+		results = self.runScriptsCached(self.ASM_SCRIPT, argLists, genDir, tests, dependencies, outputs)
+
+		for test, deps, outs, (outcome, output, usage, match) in zip(tests, dependencies, outputs, results):
+			self.printSev(self.HIGH, output, end="")
+			exact_machine_code_file = os.path.join(expPath, test)
+			if match is None:
+				try:
+					match = self.diffFiles(os.path.join(userPath, test), exact_machine_code_file)
+				except FileNotFoundError:
+					self.printSev(self.HIGH, bcolors.WARNING + "[Golden Binary Opcode File Not Found]\n" + exact_machine_code_file)
+					match = self.diffFiles(os.path.join(userPath, test), os.devnull)
+				self.storeResult(self.ASM_SCRIPT, deps, outs, outcome, output, usage, match)
+			else:
+				self.printSev(self.LOW, "cached result")
 
-			python_command = 'python3 Assembler.py'
-			if self.operating_system == 'linux':
-				assembly_file = ' ' + '../automatedTesting/tests/assembly/' + genDir + '/' + test
-				machine_code_file = ' ' + '../automatedTesting/tests/assembly/user_' + expDir + '/' + test
-				machine_code_readable_file = ' ' + '../automatedTesting/tests/assembly/user_' + expDir + '/' + test.split(".")[0]+"_r.txt"
-				os.remove(machine_code_file) if os.path.exists(machine_code_file) else None; 
-				os.remove(machine_code_readable_file) if os.path.exists(machine_code_readable_file) else None;
-				#os.system('touch' + ' ' + machine_code_file)
-			elif self.operating_system == 'windows':
-				assembly_file = ' ' + '..\\automatedTesting\\tests\\assembly\\' + genDir + '\\' + test
-				machine_code_file = ' ' + '..\\automatedTesting\\tests\\assembly\\user_' + expDir + '\\' + test
-				machine_code_readable_file = ' ' + '..\\automatedTesting\\tests\\assembly\\user_' + expDir + '\\' + test.split(".")[0]+"_r.txt"
-				os.remove(machine_code_file) if os.path.exists(machine_code_file) else None; 
-				os.remove(machine_code_readable_file) if os.path.exists(machine_code_readable_file) else None;
-				#os.system('cd . >' + machine_code_file)
-			command = python_command + assembly_file + machine_code_file + machine_code_readable_file
-			os.system(command)
-			generatedBin = open(machine_code_file.strip(),'r').readlines()
-
-			if self.operating_system == 'linux':
-				exact_machine_code_file = "../automatedTesting/tests/assembly/" + expDir + "/" + test
-			elif self.operating_system == 'windows':
-				exact_machine_code_file = "..\\automatedTesting\\tests\\assembly\\" + expDir + "\\" + test
-			try:
-				expectedBin = open(exact_machine_code_file,'r').readlines()
-			except FileNotFoundError:
-				self.printSev(self.HIGH, bcolors.WARNING + "[Golden Binary Opcode File Not Found]\n" + exact_machine_code_file)
-				expectedBin = " "
-			
 
-			if self.diff(generatedBin, expectedBin):
-				self.printSev(self.HIGH, bcolors.OKGREEN + "[PASSED]" + bcolors.ENDC + " " + test)
+			if self.printOutcome(test, outcome, match, usage):
 				passCount += 1
-			else:
-				self.printSev(self.HIGH, bcolors.FAIL + "[FAILED]" + bcolors.ENDC + " " + test)
 			totalCount += 1
 
-		os.chdir(curDir)
 		return passCount, totalCount
 	
 	
@@ -137,9 +173,9 @@ class AsmGrader(Grader):
 			self.printSev(self.HIGH, bcolors.OKBLUE + bcolors.BOLD + "\nRunning hard tests" + bcolors.ENDC)
 			hardPass, hardTotal = self.handleBin(self.ASM_HARD_DIR, self.BIN_HARD_DIR)
 			
-			# uncomment to evaluate error tests
-			# self.printSev(self.HIGH, bcolors.OKBLUE + bcolors.BOLD + "Running error tests" + bcolors.ENDC)
-			# self.handleErrorGen()  
+			if self.errorTests:
+				self.printSev(self.HIGH, bcolors.OKBLUE + bcolors.BOLD + "\nRunning error tests" + bcolors.ENDC)
+				self.handleErrorGen()
 
 			res = [
 					["Simple", simplePass, simpleTotal, self.SIMPLE_MARKS],
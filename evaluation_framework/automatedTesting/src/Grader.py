@@ -1,14 +1,45 @@
 # Parent class for all graders
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import zip_longest
 from os import listdir
 from os.path import isfile, join
 from colors import bcolors
+from ResultCache import ResultCache
+from Runner import ScriptRunner, initWorker, runInWorker, runScript, runScriptsAsync, cpuSeconds, Usage, CRASH, TIMEOUT, LIMIT, NO_LIMITS
+import Runner
 
 class Grader:
 	## ---- either 'linux' or 'windows'
 	operating_system = 'linux'
 	verbose = False
 	enable = False
+	jobs = 1
+	timeout = None
+	limits = NO_LIMITS
+	cache = None
+	# name of the tool under test, used in reports
+	TOOL = None
+
+	# Everything is located from this file, so the graders neither depend on
+	# nor change the working directory
+	BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	TESTS_DIR = os.path.join(BASE_DIR, "tests")
+	PROJECT_DIR = os.path.dirname(BASE_DIR)
+	# per-test logs of subprocess runs, one directory per suite
+	LOG_DIR = os.path.join(BASE_DIR, "logs")
+	# cached results of earlier runs, see ResultCache
+	CACHE_DIR = os.path.join(BASE_DIR, "cache")
 	
+	# Mismatches reported per comparison in verbose mode
+	MAX_REPORTED = 10
+	# Read buffer for compared files, so traces are read in large chunks
+	READ_BUFFER = 1 << 20
+
+	# None where the resource module is missing
+	RUSAGE_CHILDREN = getattr(Runner.resource, "RUSAGE_CHILDREN", None)
+
 	# Printing severity
 	HIGH = 1 	# Printed even if not verbose
 	LOW = 0
@@ -21,37 +52,151 @@ class Grader:
 		return [f for f in listdir(dirPath) if isfile(join(dirPath, f))]
 
 
-	def diff(self, lines1, lines2):
-		lines1Clean = []
-		lines2Clean = []
+	def nonBlank(self, lines):
+		for l in lines:
+			l = l.strip()
+			if l != "":
+				yield l
 
-		for l in lines1:
-			if l.strip() != "":
-				lines1Clean.append(l.strip())
+	def diff(self, lines1, lines2, maxReports=None):
+		# Compares two sequences of lines (lists or open files), ignoring blank
+		# lines and surrounding whitespace, one line at a time. Stops at the
+		# first mismatch, or in verbose mode once maxReports mismatches
+		# (default MAX_REPORTED) have been reported.
+		if maxReports is None:
+			maxReports = self.MAX_REPORTED if self.verbose else 1
+		mismatches = 0
+		for lineNum, lines in enumerate(zip_longest(self.nonBlank(lines1), self.nonBlank(lines2), fillvalue=""), 1):
+			if(lines[0] != lines[1]):
+				self.printSev(self.LOW, bcolors.FAIL + "Mismatch at line " + str(lineNum) +  "." + bcolors.ENDC)
+				mismatches += 1
+				if mismatches >= maxReports:
+					break
 
-		for l in lines2:
-			if l.strip() != "":
-				lines2Clean.append(l.strip())
+		return mismatches == 0
 
-		match = True
+	def diffFiles(self, generatedPath, expectedPath):
+		# Streams both files through diff(). A missing generated file (from a
+		# run that crashed or timed out) compares as empty; a missing expected
+		# file raises FileNotFoundError.
+		with open(expectedPath, 'r', buffering=self.READ_BUFFER) as expected:
+			try:
+				generated = open(generatedPath, 'r', buffering=self.READ_BUFFER)
+			except FileNotFoundError:
+				return self.diff([], expected)
+			with generated:
+				return self.diff(generated, expected)
 
-		# Match Size
-		if(len(lines1Clean) > len(lines2Clean)):
-			lines2Clean += [""] * (len(lines1Clean) - len(lines2Clean))
-		elif(len(lines2Clean) > len(lines1Clean)):
-			lines1Clean += [""] * (len(lines2Clean) - len(lines1Clean))
+	def runScripts(self, path, argLists, suite, tests):
+		# Runs the script at path once per argument list, up to self.jobs at a
+		# time. Returns (outcome, output, usage) for each, in the order of
+		# argLists. With a timeout or resource limits every run is a
+		# subprocess logged to LOG_DIR/suite/test.
+		if self.timeout is not None or self.limits != NO_LIMITS:
+			logPaths = [os.path.join(self.LOG_DIR, suite, test) for test in tests]
+			return runScriptsAsync(path, argLists, self.jobs, self.timeout, logPaths, self.limits)
+		if self.jobs <= 1 or len(argLists) <= 1:
+			runner = ScriptRunner.load(path)
+			return [runScript(runner, path, args) for args in argLists]
+		with ProcessPoolExecutor(max_workers=self.jobs, initializer=initWorker, initargs=(path,)) as pool:
+			return list(pool.map(runInWorker, argLists))
 
-		for lineNum, lines in enumerate(zip(lines1Clean, lines2Clean), 1):
-			if(lines[0] != lines[1]):
-				self.printSev(self.LOW, bcolors.FAIL + "Mismatch at line " + str(lineNum) +  "." + bcolors.ENDC)
-				match &= False
+	def runScriptsCached(self, path, argLists, suite, tests, dependencies, outputs):
+		# Like runScripts, but tests whose result is cached are not run.
+		# dependencies and outputs hold, per test, the files its result
+		# depends on and the files it generates. Returns (outcome, output,
+		# usage, match) per test; match is None for a test that was run, which
+		# the caller compares and then records with storeResult().
+		start = time.perf_counter_ns()
+		childCpu = cpuSeconds(self.RUSAGE_CHILDREN)
+		if self.cache is None:
+			results = [None] * len(tests)
+		else:
+			results = [self.cache.load(self.cache.key(path, deps), outs) for deps, outs in zip(dependencies, outputs)]
+		todo = [i for i, result in enumerate(results) if result is None]
+		if todo:
+			fresh = self.runScripts(path, [argLists[i] for i in todo], suite, [tests[i] for i in todo])
+			for i, result in zip(todo, fresh):
+				results[i] = result + (None,)
+		self.recordStats(suite, tests, results, todo, start, childCpu)
+		return results
+
+	def recordStats(self, suite, tests, results, ran, start, childCpu):
+		# Per test: wall and CPU seconds and peak RSS (KB) from its usage, where
+		# known. Per suite: wall time, the CPU time of the tests, the rusage
+		# CPU delta of this process's children (subprocesses and pool
+		# workers) and the largest peak RSS of the tests run, from their
+		# wait4() usage (None unless they ran as limited subprocesses). A
+		# cached test reports the usage of the run it was cached from.
+		cpuTotal = 0
+		peakRss = None
+		for i, (test, (outcome, output, usage, match)) in enumerate(zip(tests, results)):
+			if usage is None:
+				usage = Usage(None, None, None, None)
+			self.testStats.append({"tool": self.TOOL, "suite": suite, "test": test, "outcome": outcome,
+								   "cached": i not in ran, "wall": usage.wall, "cpu": usage.cpu, "rss": usage.rss})
+			if i in ran and usage.cpu is not None:
+				cpuTotal += usage.cpu
+			if i in ran and usage.rss is not None:
+				peakRss = usage.rss if peakRss is None else max(peakRss, usage.rss)
+		self.suiteStats.append({"tool": self.TOOL, "suite": suite, "tests": len(tests), "run": len(ran),
+								"wall": (time.perf_counter_ns() - start) / 1e9, "cpu": cpuTotal,
+								"childCpu": None if childCpu is None else cpuSeconds(self.RUSAGE_CHILDREN) - childCpu,
+								"peakRss": peakRss})
+
+	def stats(self):
+		return {"tests": self.testStats, "suites": self.suiteStats}
+
+	def storeResult(self, path, dependencies, outputs, outcome, output, usage, match):
+		# Timeouts and limit hits depend on the grading machine, so they are
+		# not cached
+		if self.cache is not None and outcome not in (TIMEOUT, LIMIT):
+			self.cache.store(self.cache.key(path, dependencies), outcome, output, usage, match, outputs)
+
+	def suites(self):
+		# [name, input directory, golden directory, marks per test] of each
+		# suite; implemented by every grader
+		raise NotImplementedError("Please Implement this method")
+
+	def handleSuite(self, name, only=None):
+		# Runs the suite called name, or only the tests of it in only.
+		# Returns (passed, total) of the tests run.
+		_, inputDir, goldenDir, _ = next(suite for suite in self.suites() if suite[0] == name)
+		return self.handleBin(os.path.basename(inputDir), os.path.basename(goldenDir), only)
 
-		return match
+	def printOutcome(self, test, outcome, match, usage=None):
+		# Prints the result of one test and returns whether it passed
+		if usage is not None:
+			parts = []
+			if usage.wall is not None:
+				parts.append("wall %.2fs" % usage.wall)
+			if usage.cpu is not None:
+				parts.append("cpu %.2fs" % usage.cpu)
+			if usage.rss is not None:
+				parts.append("peak rss %.1f MB" % (usage.rss / 1024))
+			self.printSev(self.LOW, ", ".join(parts))
+		if outcome == TIMEOUT:
+			self.printSev(self.HIGH, bcolors.WARNING + "[TIMEOUT]" + bcolors.ENDC + " " + test)
+		elif outcome == LIMIT:
+			self.printSev(self.HIGH, bcolors.WARNING + "[LIMIT: " + usage.limit + "]" + bcolors.ENDC + " " + test)
+		elif match:
+			self.printSev(self.HIGH, bcolors.OKGREEN + "[PASSED]" + bcolors.ENDC + " " + test)
+		elif outcome == CRASH:
+			self.printSev(self.HIGH, bcolors.FAIL + "[CRASH]" + bcolors.ENDC + " " + test)
+		else:
+			self.printSev(self.HIGH, bcolors.FAIL + "[FAILED]" + bcolors.ENDC + " " + test)
+		return outcome not in (TIMEOUT, LIMIT) and match
 
-	def __init__(self, verb, enable,operating_system):
+	def __init__(self, verb, enable,operating_system, jobs=1, timeout=None, limits=NO_LIMITS, cache=True):
 		self.verbose = verb
 		self.enable = enable
 		self.operating_system = operating_system
+		self.jobs = jobs
+		self.timeout = timeout
+		self.limits = limits
+		self.cache = ResultCache(self.CACHE_DIR) if cache else None
+		self.testStats = []
+		self.suiteStats = []
 	
 	def grade(self):
 		raise NotImplementedError("Please Implement this method")
\ No newline at end of file
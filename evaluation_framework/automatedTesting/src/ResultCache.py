@@ -0,0 +1,134 @@
+# Content-addressed cache of grading results
+#
+# A test's result is keyed by a hash of the grader's own source, of the
+# submission's Python files next to the script under test, and of the
+# files the test depends on (its input and its golden file). Re-grading an
+# unchanged test restores the files it generated and its recorded result
+# instead of running it; changing a golden file only invalidates the tests
+# that use it. Entries are evicted least recently used first once the
+# directory grows past CACHE_MAX_BYTES.
+
+import glob
+import hashlib
+import json
+import os
+
+from Runner import Usage
+
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+def hashFiles(h, paths):
+	for path in paths:
+		h.update(os.path.basename(path).encode() + b"\0")
+		try:
+			with open(path, "rb") as f:
+				h.update(hashlib.sha256(f.read()).digest())
+		except FileNotFoundError:
+			h.update(b"missing")
+
+def fileState(path):
+	try:
+		st = os.stat(path)
+	except FileNotFoundError:
+		return None
+	return (st.st_mtime_ns, st.st_size)
+
+_graderVersion = None
+
+def graderVersion():
+	# Hash of every grader source file, so changing the grader invalidates
+	# everything cached by an older one
+	global _graderVersion
+	if _graderVersion is None:
+		h = hashlib.sha256()
+		hashFiles(h, sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))))
+		_graderVersion = h.hexdigest()
+	return _graderVersion
+
+class ResultCache:
+
+	def __init__(self, cacheDir, maxBytes=CACHE_MAX_BYTES):
+		self.cacheDir = cacheDir
+		self.maxBytes = maxBytes
+		self.scriptHashes = {}
+
+	def scriptHash(self, script):
+		# The script and the modules it can import from its own directory.
+		# Remembered together with their sizes and modification times and
+		# recomputed once any of them changes, since a grader outlives edits
+		# to the submission in watch mode.
+		sources = sorted(glob.glob(os.path.join(os.path.dirname(script), "*.py")))
+		state = [(path, fileState(path)) for path in sources]
+		memo = self.scriptHashes.get(script)
+		if memo is None or memo[0] != state:
+			h = hashlib.sha256()
+			hashFiles(h, sources)
+			memo = self.scriptHashes[script] = (state, h.hexdigest())
+		return memo[1]
+
+	def key(self, script, dependencies):
+		h = hashlib.sha256()
+		h.update(graderVersion().encode())
+		h.update(self.scriptHash(script).encode())
+		hashFiles(h, dependencies)
+		return h.hexdigest()
+
+	def load(self, key, outputs):
+		# Returns the stored (outcome, output, usage, match) and rewrites the
+		# generated files at outputs, or None on a miss
+		path = os.path.join(self.cacheDir, key + ".json")
+		try:
+			with open(path, "r") as f:
+				entry = json.load(f)
+		except (OSError, ValueError):
+			return None
+		if len(entry["files"]) != len(outputs):
+			return None
+		os.utime(path)      # mark as recently used
+		for output, content in zip(outputs, entry["files"]):
+			if content is None:
+				if os.path.exists(output):
+					os.remove(output)
+			else:
+				with open(output, "w") as f:
+					f.write(content)
+		usage = None if entry["usage"] is None else Usage(*entry["usage"])
+		return entry["outcome"], entry["output"], usage, entry["match"]
+
+	def store(self, key, outcome, output, usage, match, outputs):
+		files = []
+		for outputPath in outputs:
+			try:
+				with open(outputPath, "r") as f:
+					files.append(f.read())
+			except FileNotFoundError:
+				files.append(None)
+		entry = {"outcome": outcome, "output": output, "usage": None if usage is None else list(usage),
+				 "match": match, "files": files}
+		os.makedirs(self.cacheDir, exist_ok=True)
+		# Written under a temporary name and renamed, so a concurrent run never
+		# reads a partial entry
+		path = os.path.join(self.cacheDir, key + ".json")
+		tmp = path + "." + str(os.getpid()) + ".tmp"
+		with open(tmp, "w") as f:
+			json.dump(entry, f)
+		os.replace(tmp, path)
+		self.evict()
+
+	def evict(self):
+		entries = []
+		total = 0
+		for entry in os.scandir(self.cacheDir):
+			if entry.name.endswith(".json"):
+				st = entry.stat()
+				entries.append((st.st_mtime, st.st_size, entry.path))
+				total += st.st_size
+		entries.sort()
+		for _, size, path in entries:
+			if total <= self.maxBytes:
+				break
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+			total -= size
@@ -3,10 +3,14 @@
 from colors import bcolors
 
 from Grader import Grader
+from Runner import NO_LIMITS
+from TraceDiff import compareTraces, formatComparison
 import os
 
 class SimGrader(Grader):
 
+	TOOL = "Simulator"
+
 	# 0.2 x 10
 	SIMPLE_MARKS = 2    #4/6 #0.2
 	# 0.8 x 5
@@ -19,70 +23,89 @@ class SimGrader(Grader):
 	TRACE_SIMPLE_DIR = "simple"
 
 
-	def __init__(self, verb, enable,operating_system):
-		super().__init__(verb, enable,operating_system)
+	def __init__(self, verb, enable,operating_system, jobs=1, timeout=None, limits=NO_LIMITS, cache=True):
+		super().__init__(verb, enable,operating_system, jobs, timeout, limits, cache)
 		self.enable = enable
 		self.operating_system = operating_system
 		
-		if self.operating_system == 'linux':
-			self.SIM_RUN_DIR = "../SimpleSimulator/"
-		elif self.operating_system == 'windows':
-			self.SIM_RUN_DIR = "..\\SimpleSimulator\\"
+		self.SIM_RUN_DIR = os.path.join(self.PROJECT_DIR, "SimpleSimulator")
+		self.SIM_SCRIPT = os.path.join(self.SIM_RUN_DIR, "Simulator.py")
+
+	def explainTrace(self, generatedPath, expectedPath):
+		# Register-level report for a failed test: the first step at which
+		# the traces diverge, which registers differ, a few steps around it
+		# and how often each register differs over the whole trace
+		if not os.path.exists(generatedPath) or not os.path.exists(expectedPath):
+			return
+		with open(generatedPath, 'r') as generated, open(expectedPath, 'r') as expected:
+			try:
+				comparison = compareTraces(generated, expected)
+			except ValueError as e:
+				self.printSev(self.HIGH, bcolors.WARNING + "Malformed trace: " + str(e) + bcolors.ENDC)
+				return
+		for line in formatComparison(comparison):
+			self.printSev(self.HIGH, bcolors.WARNING + line + bcolors.ENDC)
+
+	def suites(self):
+		# [name, input directory, golden directory, marks per test] of each
+		# suite, in the order grade() runs them
+		return [
+				["Simple", os.path.join(self.TESTS_DIR, "bin", self.BIN_SIMPLE_DIR),
+				 os.path.join(self.TESTS_DIR, "traces", self.TRACE_SIMPLE_DIR), self.SIMPLE_MARKS],
+				["Hard", os.path.join(self.TESTS_DIR, "bin", self.BIN_HARD_DIR),
+				 os.path.join(self.TESTS_DIR, "traces", self.TRACE_HARD_DIR), self.HARD_MARKS],
+			]
 
-	def handleBin(self, genDir, expDir):
+	def scriptArgs(self, inputFile, outputFile):
+		# Command line for one test; the readable output goes next to outputFile
+		return [inputFile, outputFile, os.path.splitext(outputFile)[0] + "_r.txt"]
+
+	def handleBin(self, genDir, expDir, only=None):
 		
 		passCount = 0
 		totalCount = 0
 		
-		curDir = os.getcwd()
-		if self.operating_system == 'linux':
-			tests = self.listFiles("tests/bin/" + genDir)
-		elif self.operating_system == 'windows':
-			tests = self.listFiles("tests\\bin\\" + genDir)
+		genPath = os.path.join(self.TESTS_DIR, "bin", genDir)
+		userPath = os.path.join(self.TESTS_DIR, "user_traces", genDir)
+		expPath = os.path.join(self.TESTS_DIR, "traces", expDir)
+		tests = self.listFiles(genPath)
 		tests.sort()
-		os.chdir(self.SIM_RUN_DIR)
-		
+		if only is not None:
+			tests = [test for test in tests if test in only]
+
+		argLists = []
+		dependencies = []
+		outputs = []
 		for test in tests:
-			
-			python_command = 'python3 Simulator.py'
-			if self.operating_system == 'linux':
-				machine_code_file = ' ' + '../automatedTesting/tests/bin/' + genDir + '/' + test
-				output_trace_file = ' ' + '../automatedTesting/tests/user_traces/' + genDir + '/' + test
-				output_read_trace_file = ' ' + '../automatedTesting/tests/user_traces/' + genDir + '/' + test.split(".")[0]+"_r.txt"
-				os.remove(output_trace_file) if os.path.exists(output_trace_file) else None; 
-				os.remove(output_read_trace_file) if os.path.exists(output_read_trace_file) else None;
-			elif self.operating_system == 'windows':
-				machine_code_file = ' ' + '..\\automatedTesting\\tests\\bin\\' + genDir + '\\' + test
-				output_trace_file = ' ' + '..\\automatedTesting\\tests\\user_traces\\' + genDir + '\\' + test
-				output_read_trace_file = ' ' + '../automatedTesting/tests/user_traces/' + genDir + '/' + test.split(".")[0]+"_r.txt"
-				os.remove(output_trace_file) if os.path.exists(output_trace_file) else None; 
-				os.remove(output_read_trace_file) if os.path.exists(output_read_trace_file) else None;
-			command = python_command + machine_code_file + output_trace_file + output_read_trace_file
-			os.system(command)
-			
-			
-			generatedTrace = open(output_trace_file.strip(),'r').readlines()
+			output_trace_file = os.path.join(userPath, test)
+			output_read_trace_file = os.path.join(userPath, test.split(".")[0]+"_r.txt")
+			os.remove(output_trace_file) if os.path.exists(output_trace_file) else None; 
+			os.remove(output_read_trace_file) if os.path.exists(output_read_trace_file) else None;
+			argLists.append(self.scriptArgs(os.path.join(genPath, test), output_trace_file))
+			dependencies.append([os.path.join(genPath, test), os.path.join(expPath, test)])
+			outputs.append([output_trace_file, output_read_trace_file])
+		results = self.runScriptsCached(self.SIM_SCRIPT, argLists, genDir, tests, dependencies, outputs)
+
+		for test, deps, outs, (outcome, output, usage, match) in zip(tests, dependencies, outputs, results):
+			self.printSev(self.HIGH, output, end="")
+			exact_trace_file = os.path.join(expPath, test)
+			if match is None:
+				try:
+					match = self.diffFiles(os.path.join(userPath, test), exact_trace_file)
+				except FileNotFoundError:
+					self.printSev(self.HIGH, bcolors.WARNING + "[Golden Binary Trace File Not Found]\n" + exact_trace_file)
+					match = self.diffFiles(os.path.join(userPath, test), os.devnull)
+				self.storeResult(self.SIM_SCRIPT, deps, outs, outcome, output, usage, match)
+			else:
+				self.printSev(self.LOW, "cached result")
 
-			if self.operating_system == 'linux':
-				exact_trace_file = "../automatedTesting/tests/traces/" + expDir + "/" + test
-			elif self.operating_system == 'windows':
-				exact_trace_file = "..\\automatedTesting\\tests\\traces\\" + expDir + "\\" + test
-				
-			try:
-				expectedTrace = open(exact_trace_file,'r').readlines()
-			except FileNotFoundError:
-				self.printSev(self.HIGH, bcolors.WARNING + "[Golden Binary Trace File Not Found]\n" + exact_trace_file)
-				expectedTrace = " "
-			
 
-			if self.diff(generatedTrace, expectedTrace):
-				self.printSev(self.HIGH, bcolors.OKGREEN + "[PASSED]" + bcolors.ENDC + " " + test)
+			if self.printOutcome(test, outcome, match, usage):
 				passCount += 1
 			else:
-				self.printSev(self.HIGH, bcolors.FAIL + "[FAILED]" + bcolors.ENDC + " " + test)
+				self.explainTrace(os.path.join(userPath, test), exact_trace_file)
 			totalCount += 1
 
-		os.chdir(curDir)
 		return passCount, totalCount
 	
 	def grade(self):
@@ -5,11 +5,21 @@ from colors import bcolors
 from AsmGrader import AsmGrader
 from SimGrader import SimGrader
 from Results import Results
+from Runner import Limits, NO_LIMITS
+from Watch import Watcher
+import Runner
 
 
 VERBOSE = False
 GRADE_ASSEMBLER = True
 GRADE_SIMULATOR = True
+JOBS = 1
+TIMEOUT = None
+LIMITS = NO_LIMITS
+CACHE = True
+STATS_JSON = None
+WATCH = False
+ERROR_TESTS = False
 
 def printHelp():
 	print('----Please enter in correct format----')
@@ -18,26 +28,71 @@ def printHelp():
 	print("--no-sim to not grade simulator")
 	print("--linux for Linux operating system")
 	print("--windows for windows operating system")
+	print("--jobs N to run N tests at a time")
+	print("--timeout S to kill a test after S seconds (runs every test as a subprocess)")
+	print("--cpu-limit S, --mem-limit MB, --fsize-limit MB to limit each test's CPU time, memory and")
+	print("    output file size (runs every test as a subprocess, Linux/macOS only)")
+	print("--no-cache to run every test even if its result is cached")
+	print("--error-tests to also run the assembler error tests (tests/assembly/errorGen)")
+	print("--watch to keep running and re-run the tests affected by every change")
+	print("--stats-json FILE to write the marks and the time and memory used by every test to FILE")
 	print("Example_linux: $python3 src/main.py --linux --no-sim")
 	print("Example_windows: >python3 src\main.py --windows --no-sim")
 
+def popOption(args, name, convert):
+	# Removes "name value" from args and returns the converted value, or None
+	# if the option is absent
+	if name not in args:
+		return None
+	index = args.index(name)
+	try:
+		value = convert(args[index + 1])
+	except (IndexError, ValueError):
+		printHelp()
+		exit()
+	del args[index:index + 2]
+	return value
+
 def setupArgs():
 	global VERBOSE
 	global GRADE_ASSEMBLER
 	global GRADE_SIMULATOR
 	global OPERATING_SYSTEM
+	global JOBS
+	global TIMEOUT
+	global LIMITS
+	global CACHE
+	global STATS_JSON
+	global WATCH
+	global ERROR_TESTS
 
 	if len(sys.argv) < 3:
 		printHelp()
 		exit()
 
-	for arg in sys.argv[1:]:
+	args = sys.argv[1:]
+	JOBS = popOption(args, "--jobs", int) or JOBS
+	TIMEOUT = popOption(args, "--timeout", float)
+	STATS_JSON = popOption(args, "--stats-json", str)
+	megabytes = lambda value: int(float(value) * 1024 * 1024)
+	LIMITS = Limits(popOption(args, "--cpu-limit", int), popOption(args, "--mem-limit", megabytes),
+					popOption(args, "--fsize-limit", megabytes))
+	if LIMITS != NO_LIMITS and Runner.resource is None:
+		print(bcolors.WARNING + "Resource limits are not supported on this system and are ignored" + bcolors.ENDC)
+
+	for arg in args:
 		if arg == "--verbose":
 			VERBOSE = True
 		elif arg == "--no-asm":
 			GRADE_ASSEMBLER = False
 		elif arg == "--no-sim":
 			GRADE_SIMULATOR = False
+		elif arg == "--no-cache":
+			CACHE = False
+		elif arg == "--watch":
+			WATCH = True
+		elif arg == "--error-tests":
+			ERROR_TESTS = True
 		elif ((arg == "--linux") | (arg == "--windows")):
 			OPERATING_SYSTEM = arg[2:]
 		else:
@@ -48,14 +103,22 @@ def setupArgs():
 def main():
 	setupArgs()
 
-	asmGrader = AsmGrader(VERBOSE, GRADE_ASSEMBLER,OPERATING_SYSTEM)
-	simGrader = SimGrader(VERBOSE, GRADE_SIMULATOR,OPERATING_SYSTEM)
+	asmGrader = AsmGrader(VERBOSE, GRADE_ASSEMBLER,OPERATING_SYSTEM, JOBS, TIMEOUT, LIMITS, CACHE, ERROR_TESTS)
+	simGrader = SimGrader(VERBOSE, GRADE_SIMULATOR,OPERATING_SYSTEM, JOBS, TIMEOUT, LIMITS, CACHE)
+
+	if WATCH:
+		graders = [(asmGrader, asmGrader.ASM_SCRIPT), (simGrader, simGrader.SIM_SCRIPT)]
+		Watcher([(grader, script) for grader, script in graders if grader.enable]).watch()
+		return
 
 	asmRes = asmGrader.grade()
 	simRes = simGrader.grade()	
 
-	res = Results(VERBOSE, asmRes, simRes)
+	stats = {grader.TOOL: grader.stats() for grader in (asmGrader, simGrader) if grader.enable}
+	res = Results(VERBOSE, asmRes, simRes, stats)
 	res.declare()
+	if STATS_JSON is not None:
+		res.writeJson(STATS_JSON)
 	
 
 if __name__ == '__main__':
@@ -0,0 +1,193 @@
+# Regenerates the golden machine code and traces from the test sources
+#
+# For every source in tests/assembly/simpleBin (and hardBin) the reference
+# assembler writes the expected machine code to tests/assembly/bin_s and
+# tests/bin/simple, and the reference simulator writes the expected traces
+# to tests/traces/simple and tests/traces/simple_readable. Tests run in a
+# process pool; every worker imports the two tools once. Every output is
+# written under a temporary name and renamed into place, so an interrupted
+# run never leaves a half written golden file.
+#
+# tests/manifest.json records, per test, the hash of its source, of the
+# tools that built it and of every output. A test is rebuilt only when its
+# source or the tools changed or one of its outputs is missing or was
+# edited since.
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from colors import bcolors
+from Runner import importScript
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIR = os.path.join(BASE_DIR, "tests")
+PROJECT_DIR = os.path.dirname(BASE_DIR)
+REPO_DIR = os.path.dirname(PROJECT_DIR)
+MANIFEST = os.path.join(TESTS_DIR, "manifest.json")
+
+# The reference assembler lives in the course project, the reference
+# simulator in this framework
+ASSEMBLER = os.path.join(REPO_DIR, "CO_Project_Allocated_jan30_2025", "SimpleAssembler", "Assembler.py")
+SIMULATOR = os.path.join(PROJECT_DIR, "SimpleSimulator", "Simulator.py")
+
+# suite: (source directory, machine code directories, trace directory,
+# readable trace directory), relative to TESTS_DIR
+SUITES = {
+	"simple": ("assembly/simpleBin", ["assembly/bin_s", "bin/simple"], "traces/simple", "traces/simple_readable"),
+	"hard": ("assembly/hardBin", ["assembly/bin_h", "bin/hard"], "traces/hard", "traces/hard_readable"),
+}
+
+def fileHash(path):
+	try:
+		with open(path, "rb") as f:
+			return hashlib.sha256(f.read()).hexdigest()
+	except FileNotFoundError:
+		return None
+
+def toolsHash(tools):
+	# Hash of the tools and of the isa.py shipped next to each
+	h = hashlib.sha256()
+	for tool in tools:
+		for path in (tool, os.path.join(os.path.dirname(tool), "isa.py")):
+			h.update((fileHash(path) or "missing").encode())
+	return h.hexdigest()
+
+def outputPaths(suite, test):
+	_, binDirs, traceDir, readableDir = SUITES[suite]
+	readable = os.path.splitext(test)[0] + "_r.txt"
+	return [os.path.join(d, test) for d in binDirs] + \
+		   [os.path.join(traceDir, test), os.path.join(readableDir, test), os.path.join(readableDir, readable)]
+
+# Worker state: the reference tools, imported once per process
+assembler = None
+simulator = None
+
+def initWorker(assemblerPath, simulatorPath):
+	global assembler, simulator
+	assembler = importScript("Assembler", assemblerPath)
+	simulator = importScript("Simulator", simulatorPath)
+
+def build(job):
+	# Builds one test. Returns (suite, test, {output: hash}, None) or
+	# (suite, test, None, error message).
+	suite, test = job
+	sourceDir = SUITES[suite][0]
+	outputs = outputPaths(suite, test)
+	paths = [os.path.join(TESTS_DIR, output) for output in outputs]
+	tmps = [path + "." + str(os.getpid()) + ".tmp" for path in paths]
+	for path in paths:
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+	binTmps = tmps[:-3]
+	traceTmp, readableTmp, readableRTmp = tmps[-3:]
+	try:
+		with contextlib.redirect_stdout(io.StringIO()):
+			assembler.assemble(os.path.join(TESTS_DIR, sourceDir, test), binTmps[0])
+			for tmp in binTmps[1:]:
+				shutil.copyfile(binTmps[0], tmp)
+			simulator.run_simulator(binTmps[0], readableTmp, readableRTmp)
+			shutil.copyfile(readableTmp, traceTmp)
+	except Exception as e:
+		for tmp in tmps:
+			if os.path.exists(tmp):
+				os.remove(tmp)
+		return suite, test, None, str(e)
+	for tmp, path in zip(tmps, paths):
+		os.replace(tmp, path)
+	return suite, test, {output: fileHash(path) for output, path in zip(outputs, paths)}, None
+
+def upToDate(entry, sourceHash, tools):
+	if entry is None or entry["source"] != sourceHash or entry["tools"] != tools:
+		return False
+	return all(fileHash(os.path.join(TESTS_DIR, output)) == digest for output, digest in entry["outputs"].items())
+
+def readManifest():
+	try:
+		with open(MANIFEST, "r") as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		return {}
+
+def writeManifest(manifest):
+	tmp = MANIFEST + "." + str(os.getpid()) + ".tmp"
+	with open(tmp, "w") as f:
+		json.dump(manifest, f, indent=1, sort_keys=True)
+		f.write("\n")
+	os.replace(tmp, MANIFEST)
+
+def regenerate(jobs, force=False, assemblerPath=ASSEMBLER, simulatorPath=SIMULATOR):
+	# Returns the number of tests that failed to build
+	tools = toolsHash([assemblerPath, simulatorPath])
+	manifest = readManifest()
+	todo = []
+	sourceHashes = {}
+	for suite, (sourceDir, _, _, _) in SUITES.items():
+		sourcePath = os.path.join(TESTS_DIR, sourceDir)
+		if not os.path.isdir(sourcePath):
+			continue
+		for test in sorted(os.listdir(sourcePath)):
+			key = suite + "/" + test
+			sourceHashes[key] = fileHash(os.path.join(sourcePath, test))
+			if force or not upToDate(manifest.get(key), sourceHashes[key], tools):
+				todo.append((suite, test))
+	print(str(len(sourceHashes) - len(todo)) + " up to date, " + str(len(todo)) + " to build")
+
+	failures = 0
+	if todo:
+		with ProcessPoolExecutor(max_workers=jobs, initializer=initWorker,
+								 initargs=(assemblerPath, simulatorPath)) as pool:
+			for suite, test, hashes, error in pool.map(build, todo):
+				key = suite + "/" + test
+				if error is not None:
+					print(bcolors.FAIL + "[ERROR] " + bcolors.ENDC + key + ": " + error)
+					manifest.pop(key, None)
+					failures += 1
+				else:
+					print(bcolors.OKGREEN + "[BUILT] " + bcolors.ENDC + key)
+					manifest[key] = {"source": sourceHashes[key], "tools": tools, "outputs": hashes}
+	# forget tests whose source was removed
+	manifest = {key: entry for key, entry in manifest.items() if key in sourceHashes}
+	writeManifest(manifest)
+	return failures
+
+def main():
+	args = sys.argv[1:]
+	jobs = os.cpu_count() or 1
+	assemblerPath, simulatorPath = ASSEMBLER, SIMULATOR
+	force = "--force" in args
+	args = [arg for arg in args if arg != "--force"]
+	try:
+		while args:
+			option, value = args[0], args[1]
+			if option == "--jobs":
+				jobs = int(value)
+			elif option == "--assembler":
+				assemblerPath = os.path.abspath(value)
+			elif option == "--simulator":
+				simulatorPath = os.path.abspath(value)
+			else:
+				raise ValueError(option)
+			del args[:2]
+	except (IndexError, ValueError):
+		print("Usage: python3 src/regenerate.py [--jobs N] [--force] [--assembler Assembler.py] [--simulator Simulator.py]")
+		exit(1)
+	for option, path in (("--assembler", assemblerPath), ("--simulator", simulatorPath)):
+		if not os.path.exists(path):
+			print(path + " not found; pass " + option + " PATH")
+			exit(1)
+	try:
+		failures = regenerate(jobs, force, assemblerPath, simulatorPath)
+	except BrokenProcessPool:
+		# a worker died, most likely while importing the tools
+		print(bcolors.FAIL + "[ERROR] " + bcolors.ENDC + "could not load " + assemblerPath + " and " + simulatorPath)
+		exit(1)
+	exit(1 if failures else 0)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,264 @@
+# Throughput benchmarks for the assembler and the simulator
+#
+# Every workload is a set of assembly programs. The simple workload is the
+# programs of automatedTesting/tests/assembly/simpleBin; the others are
+# generated here and stress one thing each: a long straight line program
+# (assembler throughput), nested counted loops, sweeps over the data
+# segment with lw/sw, deep jal/jalr call chains and a random program from
+# generate.py.
+#
+# Each workload is measured in a fresh Python process, so the peak RSS
+# reported is that workload's own. Assembler.assemble and
+# Simulator.run_simulator are each timed over the whole workload and the
+# best of --repeat runs is kept. Results are written as JSON and compared
+# against a saved baseline; a rate that dropped, or a peak RSS that grew,
+# by more than --threshold is reported as a regression.
+
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate import generate, importScript, Settings
+
+try:
+	import resource
+except ImportError:
+	# peak RSS is not reported on Windows
+	resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+REPO_DIR = os.path.dirname(PROJECT_DIR)
+SIMPLE_TESTS = os.path.join(PROJECT_DIR, "automatedTesting", "tests", "assembly", "simpleBin")
+
+ASSEMBLER = os.path.join(REPO_DIR, "CO_Project_Allocated_jan30_2025", "SimpleAssembler", "Assembler.py")
+SIMULATOR = os.path.join(PROJECT_DIR, "SimpleSimulator", "Simulator.py")
+BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+REPEAT = 3
+THRESHOLD = 0.10
+
+def straightLine(count):
+	ops = ["add t0,t0,t1", "xor t1,t1,t0", "addi t2,t2,3", "sub t3,t2,t0", "or t4,t3,t1", "and t5,t4,t2"]
+	return "\n".join(ops[i % len(ops)] for i in range(count)) + "\nbeq zero,zero,0\n"
+
+def countedLoops(outer, inner):
+	return "\n".join([
+		"addi s0,zero,0",
+		"addi s2,zero," + str(outer),
+		"outer: addi s1,zero,0",
+		"addi s3,zero," + str(inner),
+		"inner: addi s1,s1,1",
+		"add t0,t0,s1",
+		"xor t1,t1,t0",
+		"blt s1,s3,inner",
+		"addi s0,s0,1",
+		"blt s0,s2,outer",
+		"beq zero,zero,0",
+	]) + "\n"
+
+def memorySweep(words, passes):
+	return "\n".join([
+		"addi s5,zero,1",
+		"slli s5,s5,16",            # 0x00010000, the data segment
+		"addi s0,zero,0",
+		"addi s2,zero," + str(passes),
+		"pass: addi t0,s5,0",
+		"addi t1,zero,0",
+		"addi t2,zero," + str(words),
+		"sweep: lw t3,0(t0)",
+		"add t3,t3,t1",
+		"sw t3,0(t0)",
+		"addi t0,t0,4",
+		"addi t1,t1,1",
+		"blt t1,t2,sweep",
+		"addi s0,s0,1",
+		"blt s0,s2,pass",
+		"beq zero,zero,0",
+	]) + "\n"
+
+def callChain(depth, repeats):
+	lines = ["jal zero,start"]
+	for i in range(depth - 1):
+		lines += ["f%d: addi sp,sp,-4" % i, "sw ra,0(sp)", "jal ra,f%d" % (i + 1), "lw ra,0(sp)", "addi sp,sp,4",
+				  "jalr zero,ra,0"]
+	lines += ["f%d: addi a0,a0,1" % (depth - 1), "jalr zero,ra,0"]
+	lines += ["start: addi s0,zero,0", "addi s2,zero," + str(repeats), "main: jal ra,f0", "addi s0,s0,1",
+			  "blt s0,s2,main", "beq zero,zero,0"]
+	return "\n".join(lines) + "\n"
+
+def simpleTests():
+	programs = []
+	for name in sorted(os.listdir(SIMPLE_TESTS)):
+		with open(os.path.join(SIMPLE_TESTS, name), "r") as f:
+			programs.append((name, f.read()))
+	return programs
+
+# name: function returning [(file name, source)]
+WORKLOADS = {
+	"simple": simpleTests,
+	"straight_line": lambda: [("straight.txt", straightLine(20000))],
+	"counted_loops": lambda: [("loops.txt", countedLoops(20, 1000))],
+	"memory_sweep": lambda: [("sweep.txt", memorySweep(32, 300))],
+	"call_chain": lambda: [("calls.txt", callChain(32, 200))],
+	"random": lambda: [("random.txt", generate(Settings(5000, 3, 6, 0.1, 32), seed=1))],
+}
+
+def bestTime(repeat, function):
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter_ns()
+		function()
+		elapsed = (time.perf_counter_ns() - start) / 1e9
+		best = elapsed if best is None else min(best, elapsed)
+	return best
+
+def measure(workload, assemblerPath, simulatorPath, repeat):
+	# Runs in the child process. Returns the metrics of one workload.
+	assembler = importScript("Assembler", assemblerPath)
+	simulator = importScript("Simulator", simulatorPath)
+	programs = WORKLOADS[workload]()
+	lines = sum(1 for _, source in programs for line in source.splitlines() if line.strip())
+	with tempfile.TemporaryDirectory() as tempDir:
+		runs = []
+		for name, source in programs:
+			base = os.path.join(tempDir, os.path.splitext(name)[0])
+			with open(base + ".s", "w") as f:
+				f.write(source)
+			runs.append((base + ".s", base + ".bin.txt", base + ".trace.txt", base + ".trace_r.txt"))
+
+		def assembleAll():
+			with contextlib.redirect_stdout(io.StringIO()):
+				for source, binary, _, _ in runs:
+					assembler.assemble(source, binary)
+
+		def simulateAll():
+			for _, binary, trace, traceR in runs:
+				simulator.run_simulator(binary, trace, traceR)
+
+		assembleTime = bestTime(repeat, assembleAll)
+		simulateTime = bestTime(repeat, simulateAll)
+		instructions = 0
+		traceBytes = 0
+		for _, _, trace, traceR in runs:
+			with open(traceR, "r") as f:
+				instructions += sum(1 for line in f if line.strip() and ":" not in line)
+			traceBytes += os.path.getsize(trace) + os.path.getsize(traceR)
+	return {
+		"lines": lines,
+		"instructions": instructions,
+		"traceBytes": traceBytes,
+		"assembleSeconds": assembleTime,
+		"simulateSeconds": simulateTime,
+		"linesPerSec": lines / assembleTime,
+		"instructionsPerSec": instructions / simulateTime,
+		"traceBytesPerSec": traceBytes / simulateTime,
+		"peakRssKb": None if resource is None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+	}
+
+def runWorkload(workload, assemblerPath, simulatorPath, repeat):
+	result = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", workload, assemblerPath,
+							 simulatorPath, str(repeat)], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+	if result.returncode != 0:
+		raise RuntimeError(workload + " failed:\n" + result.stderr)
+	return json.loads(result.stdout)
+
+# metric: True if higher is better
+METRICS = {"linesPerSec": True, "instructionsPerSec": True, "traceBytesPerSec": True, "peakRssKb": False}
+
+def compare(results, baseline, threshold):
+	# Returns [(workload, metric, baseline value, current value)] of every
+	# regression beyond threshold
+	regressions = []
+	for workload, metrics in results["workloads"].items():
+		previous = baseline.get("workloads", {}).get(workload)
+		if previous is None:
+			continue
+		for metric, higherIsBetter in METRICS.items():
+			old, new = previous.get(metric), metrics.get(metric)
+			if old is None or new is None:
+				continue
+			if (higherIsBetter and new < old * (1 - threshold)) or (not higherIsBetter and new > old * (1 + threshold)):
+				regressions.append((workload, metric, old, new))
+	return regressions
+
+def printResults(results):
+	print("%-14s %12s %14s %16s %10s" % ("Workload", "Lines/s", "Instr/s", "Trace bytes/s", "RSS (MB)"))
+	for workload, m in results["workloads"].items():
+		rss = "-" if m["peakRssKb"] is None else "%.1f" % (m["peakRssKb"] / 1024)
+		print("%-14s %12.0f %14.0f %16.0f %10s" % (workload, m["linesPerSec"], m["instructionsPerSec"],
+												   m["traceBytesPerSec"], rss))
+
+def printHelp():
+	print("Usage: python3 benchmarks/bench.py [options]")
+	print("--assembler PATH, --simulator PATH  tools to measure (default: the course assembler and SimpleSimulator/)")
+	print("--workloads a,b,...  workloads to run, of: " + ", ".join(WORKLOADS))
+	print("--repeat N           timed runs per workload, the best is kept (default 3)")
+	print("--output FILE        write the results as JSON to FILE")
+	print("--baseline FILE      baseline to compare against (default benchmarks/baseline.json)")
+	print("--save-baseline      save the results as the new baseline")
+	print("--threshold F        relative change reported as a regression (default 0.10)")
+
+def main():
+	args = sys.argv[1:]
+	if args and args[0] == "--measure":
+		print(json.dumps(measure(args[1], args[2], args[3], int(args[4]))))
+		return
+
+	options = {"--assembler": ASSEMBLER, "--simulator": SIMULATOR, "--workloads": ",".join(WORKLOADS),
+			   "--repeat": str(REPEAT), "--output": None, "--baseline": BASELINE, "--threshold": str(THRESHOLD)}
+	saveBaseline = "--save-baseline" in args
+	args = [arg for arg in args if arg != "--save-baseline"]
+	try:
+		while args:
+			if args[0] not in options:
+				raise ValueError(args[0])
+			options[args[0]] = args[1]
+			del args[:2]
+		workloads = options["--workloads"].split(",")
+		repeat = int(options["--repeat"])
+		threshold = float(options["--threshold"])
+		if any(workload not in WORKLOADS for workload in workloads):
+			raise ValueError(options["--workloads"])
+	except (IndexError, ValueError):
+		printHelp()
+		exit(1)
+	for option in ("--assembler", "--simulator"):
+		if not os.path.exists(options[option]):
+			print(options[option] + " not found; pass " + option + " PATH")
+			exit(1)
+
+	results = {
+		"python": platform.python_version(),
+		"machine": platform.machine(),
+		"workloads": {workload: runWorkload(workload, os.path.abspath(options["--assembler"]),
+											os.path.abspath(options["--simulator"]), repeat)
+					  for workload in workloads},
+	}
+	printResults(results)
+	if options["--output"] is not None:
+		with open(options["--output"], "w") as f:
+			json.dump(results, f, indent=2)
+
+	regressions = []
+	if os.path.exists(options["--baseline"]) and not saveBaseline:
+		with open(options["--baseline"], "r") as f:
+			regressions = compare(results, json.load(f), threshold)
+		for workload, metric, old, new in regressions:
+			print("REGRESSION %s %s: %.0f -> %.0f" % (workload, metric, old, new))
+		if not regressions:
+			print("No regressions against " + options["--baseline"])
+	if saveBaseline:
+		with open(options["--baseline"], "w") as f:
+			json.dump(results, f, indent=2)
+		print("Baseline saved to " + options["--baseline"])
+	exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,261 @@
+# Seeded generator of random, always terminating assembly programs
+#
+# Programs use the register-register and register-immediate ALU
+# instructions, lw/sw on the data segment at 0x00010000, forward
+# beq/bne/blt/bge/bltu/bgeu/jal skips and counted loops, and end with
+# beq zero,zero,0. Termination is guaranteed by construction: the only
+# backward branch is the one closing a counted loop, whose counter
+# (s0, s1, ...) nothing else writes, and every other branch jumps forward.
+# The same seed and settings always give the same program.
+#
+# With --fuzz N the programs of seeds 0..N-1 are run through the assembler
+# and the simulator as a differential test: every word must decode to the
+# mnemonic and registers of its source line, the program must halt, and
+# the peephole optimized program (Assembler -O) must reach the same final
+# registers and memory.
+
+import os
+import random
+import sys
+from collections import namedtuple
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(PROJECT_DIR)
+ASSEMBLER = os.path.join(REPO_DIR, "CO_Project_Allocated_jan30_2025", "SimpleAssembler", "Assembler.py")
+SIMULATOR = os.path.join(PROJECT_DIR, "SimpleSimulator", "Simulator.py")
+
+# The tools are imported with the graders' loader
+sys.path.insert(0, os.path.join(PROJECT_DIR, "automatedTesting", "src"))
+from Runner import importScript
+
+# instructions: static instruction count (approximate, the halt and the
+#   loop and data segment set up come on top)
+# loopDepth: deepest loop nesting, at most len(COUNTERS)
+# tripCount: loops run between 1 and tripCount times
+# branchDensity: probability that a straight line instruction is preceded
+#   by a forward skip
+# memoryWords: words of the data segment used by lw/sw, 0 for none
+Settings = namedtuple("Settings", ["instructions", "loopDepth", "tripCount", "branchDensity", "memoryWords"])
+DEFAULT_SETTINGS = Settings(200, 2, 8, 0.1, 16)
+
+COUNTERS = ["s0", "s1", "s2", "s3", "s4", "s5"]
+BASE = "s11"                # holds 0x00010000
+DESTINATIONS = ["t0", "t1", "t2", "t3", "t4", "t5", "t6", "a0", "a1", "a2", "a3", "a4", "a5", "a6", "a7"]
+SOURCES = DESTINATIONS + ["zero"]
+
+R_OPS = ["add", "sub", "sll", "slt", "sltu", "xor", "srl", "sra", "or", "and"]
+I_OPS = ["addi", "slti", "sltiu", "xori", "ori", "andi"]
+SHIFT_OPS = ["slli", "srli", "srai"]
+SKIP_OPS = ["beq", "bne", "blt", "bge", "bltu", "bgeu"]
+
+# Largest loop body, in instructions, so the closing bne stays in range
+MAX_LOOP_BODY = 400
+# Chance that a free slot starts a loop rather than a straight instruction
+LOOP_CHANCE = 0.05
+# Data words the simulator reports (its memory_keys, 0x00010000 to
+# 0x0001007C); stores beyond them would not show up in the trace
+MAX_MEMORY_WORDS = 32
+
+def checkSettings(settings):
+	# Raises ValueError naming the first setting the generator cannot honour
+	if settings.instructions < 0:
+		raise ValueError("instructions must be at least 0, got %d" % settings.instructions)
+	if settings.loopDepth < 0:
+		raise ValueError("loopDepth must be at least 0, got %d" % settings.loopDepth)
+	if settings.tripCount < 1:
+		raise ValueError("tripCount must be at least 1, got %d" % settings.tripCount)
+	if not 0 <= settings.branchDensity <= 1:
+		raise ValueError("branchDensity must be between 0 and 1, got %g" % settings.branchDensity)
+	if not 0 <= settings.memoryWords <= MAX_MEMORY_WORDS:
+		raise ValueError("memoryWords must be between 0 and %d (the data words the simulator reports), got %d"
+						 % (MAX_MEMORY_WORDS, settings.memoryWords))
+
+class Generator:
+
+	def __init__(self, settings, seed):
+		checkSettings(settings)
+		self.settings = settings
+		self.random = random.Random(seed)
+		self.lines = []
+		self.pendingLabels = []
+		self.labelCount = 0
+
+	def label(self, prefix):
+		self.labelCount += 1
+		return prefix + str(self.labelCount)
+
+	def emit(self, instruction):
+		# Labels waiting for the next instruction are put in front of it
+		if self.pendingLabels:
+			for label in self.pendingLabels[:-1]:
+				self.lines.append(label + ":")
+			instruction = self.pendingLabels[-1] + ": " + instruction
+			self.pendingLabels = []
+		self.lines.append(instruction)
+
+	def straight(self):
+		r = self.random
+		if self.settings.memoryWords and r.random() < 0.2:
+			offset = 4 * r.randrange(self.settings.memoryWords)
+			if r.random() < 0.5:
+				return "lw %s,%d(%s)" % (r.choice(DESTINATIONS), offset, BASE)
+			return "sw %s,%d(%s)" % (r.choice(SOURCES), offset, BASE)
+		kind = r.random()
+		if kind < 0.45:
+			return "%s %s,%s,%s" % (r.choice(R_OPS), r.choice(DESTINATIONS), r.choice(SOURCES), r.choice(SOURCES))
+		if kind < 0.85:
+			return "%s %s,%s,%d" % (r.choice(I_OPS), r.choice(DESTINATIONS), r.choice(SOURCES), r.randint(-2048, 2047))
+		return "%s %s,%s,%d" % (r.choice(SHIFT_OPS), r.choice(DESTINATIONS), r.choice(SOURCES), r.randrange(32))
+
+	def skip(self):
+		# A forward branch or jal over the next few instructions
+		target = self.label("skip")
+		if self.random.random() < 0.2:
+			self.emit("jal zero," + target)
+		else:
+			self.emit("%s %s,%s,%s" % (self.random.choice(SKIP_OPS), self.random.choice(SOURCES),
+									   self.random.choice(SOURCES), target))
+		for _ in range(self.random.randint(1, 3)):
+			self.emit(self.straight())
+		self.pendingLabels.append(target)
+
+	def loop(self, budget, depth):
+		counter = COUNTERS[depth]
+		start = self.label("loop")
+		self.emit("addi %s,zero,%d" % (counter, self.random.randint(1, self.settings.tripCount)))
+		self.pendingLabels.append(start)
+		self.block(min(budget, MAX_LOOP_BODY), depth + 1)
+		self.emit("addi %s,%s,-1" % (counter, counter))
+		self.emit("bne %s,zero,%s" % (counter, start))
+
+	def block(self, budget, depth):
+		# Emits about budget instructions at loop nesting depth
+		end = len(self.lines) + budget
+		while len(self.lines) < end:
+			left = end - len(self.lines)
+			if depth < min(self.settings.loopDepth, len(COUNTERS)) and left > 4 and self.random.random() < LOOP_CHANCE:
+				self.loop(self.random.randint(1, left - 3), depth)
+			elif self.random.random() < self.settings.branchDensity:
+				self.skip()
+			else:
+				self.emit(self.straight())
+
+	def generate(self):
+		if self.settings.memoryWords:
+			self.emit("addi %s,zero,1" % BASE)
+			self.emit("slli %s,%s,16" % (BASE, BASE))
+		self.block(self.settings.instructions, 0)
+		self.emit("beq zero,zero,0")
+		return "\n".join(self.lines) + "\n"
+
+def generate(settings=DEFAULT_SETTINGS, seed=0):
+	return Generator(settings, seed).generate()
+
+# Order of the register operands in the source, per format, as fields of
+# the simulator's decoded instruction
+OPERAND_FIELDS = {"R": ["rd", "rs1", "rs2"], "I": ["rd", "rs1"], "IS": ["rd", "rs1"], "IL": ["rd", "rs1"],
+				  "S": ["rs2", "rs1"], "B": ["rs1", "rs2"], "J": ["rd"], "U": ["rd"], "SP": []}
+
+def sourceRegisters(operands, registers):
+	names = []
+	for operand in operands:
+		if "(" in operand:
+			operand = operand[operand.index("(") + 1:-1]
+		if operand in registers:
+			names.append("x" + str(registers[operand]))
+	return names
+
+def checkProgram(source, assembler, simulator, registers):
+	# Returns None if the program passes the differential checks, else why not
+	try:
+		program = assembler.assemble_source(source)
+		optimized = assembler.assemble_source(source, optimize=True)
+	except assembler.AssemblerError as e:
+		return "assembler error: " + str(e)
+	instructions = [line.split(":", 1)[-1].replace(",", " ").split() for line in source.splitlines()]
+	instructions = [parts for parts in instructions if parts]
+	if len(instructions) != len(program.words):
+		return "%d instructions assembled to %d words" % (len(instructions), len(program.words))
+	for index, (parts, word) in enumerate(zip(instructions, program.words)):
+		decoded = simulator.decode_word(word)
+		if isinstance(decoded, str):
+			return "word %d (%s) does not decode: %s" % (index, " ".join(parts), decoded)
+		fields = [decoded[field] for field in OPERAND_FIELDS[decoded["type"]]]
+		if decoded["operation"] != parts[0] or fields != sourceRegisters(parts[1:], registers):
+			return "word %d (%s) decodes to %s %s" % (index, " ".join(parts), decoded["operation"], ",".join(fields))
+	equal, retired, _ = simulator.compare_programs(program, optimized)
+	if retired >= simulator.MAX_STEPS:
+		return "did not halt within %d steps" % simulator.MAX_STEPS
+	if not equal:
+		return "optimized program ends in a different state"
+	return None
+
+def fuzz(count, settings, assemblerPath, simulatorPath):
+	# Returns the number of failing seeds
+	assembler = importScript("Assembler", assemblerPath)
+	simulator = importScript("Simulator", simulatorPath)
+	registers = simulator.isa.REGISTERS
+	failures = 0
+	for seed in range(count):
+		problem = checkProgram(generate(settings, seed), assembler, simulator, registers)
+		if problem is not None:
+			print("seed %d: %s" % (seed, problem))
+			failures += 1
+	print("%d of %d programs passed" % (count - failures, count))
+	return failures
+
+def printHelp():
+	print("Usage: python3 benchmarks/generate.py [options] [output_file]")
+	print("       python3 benchmarks/generate.py [options] --fuzz N [--assembler PATH] [--simulator PATH]")
+	print("--seed N            random seed (default 0)")
+	print("--instructions N    approximate static instruction count (default %d)" % DEFAULT_SETTINGS.instructions)
+	print("--loop-depth N      deepest loop nesting, at most %d (default %d)" % (len(COUNTERS), DEFAULT_SETTINGS.loopDepth))
+	print("--trip-count N      largest loop trip count (default %d)" % DEFAULT_SETTINGS.tripCount)
+	print("--branch-density F chance of a forward skip before an instruction (default %g)" % DEFAULT_SETTINGS.branchDensity)
+	print("--memory-words N    data segment words used by lw/sw, at most %d (default %d)" % (MAX_MEMORY_WORDS, DEFAULT_SETTINGS.memoryWords))
+
+def main():
+	args = sys.argv[1:]
+	options = {"--seed": "0", "--instructions": str(DEFAULT_SETTINGS.instructions),
+			   "--loop-depth": str(DEFAULT_SETTINGS.loopDepth), "--trip-count": str(DEFAULT_SETTINGS.tripCount),
+			   "--branch-density": str(DEFAULT_SETTINGS.branchDensity),
+			   "--memory-words": str(DEFAULT_SETTINGS.memoryWords), "--fuzz": None,
+			   "--assembler": ASSEMBLER, "--simulator": SIMULATOR}
+	output = None
+	try:
+		while args:
+			if args[0] in options:
+				options[args[0]] = args[1]
+				del args[:2]
+			elif output is None and not args[0].startswith("--"):
+				output = args.pop(0)
+			else:
+				raise ValueError(args[0])
+		settings = Settings(int(options["--instructions"]), int(options["--loop-depth"]),
+							int(options["--trip-count"]), float(options["--branch-density"]),
+							int(options["--memory-words"]))
+		seed = int(options["--seed"])
+	except (IndexError, ValueError):
+		printHelp()
+		exit(1)
+	try:
+		checkSettings(settings)
+	except ValueError as e:
+		print("Invalid settings: %s" % e)
+		exit(1)
+
+	if options["--fuzz"] is not None:
+		for option in ("--assembler", "--simulator"):
+			if not os.path.exists(options[option]):
+				print(options[option] + " not found; pass " + option + " PATH")
+				exit(1)
+		exit(1 if fuzz(int(options["--fuzz"]), settings, options["--assembler"], options["--simulator"]) else 0)
+	program = generate(settings, seed)
+	if output is None:
+		sys.stdout.write(program)
+	else:
+		with open(output, "w") as f:
+			f.write(program)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,158 @@
+# Tests for CO_Project_Allocated_jan30_2025/SimpleAssembler/Assembler.py
+# Run from the repository root: python3 -m unittest discover tests
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "CO_Project_Allocated_jan30_2025", "SimpleAssembler"))
+sys.path.insert(0, os.path.join(REPO_DIR, "evaluation_framework", "automatedTesting", "src"))
+import Assembler
+from Runner import importScript
+
+Simulator = importScript("Simulator", os.path.join(REPO_DIR, "evaluation_framework", "SimpleSimulator", "Simulator.py"))
+
+def two_pass_error(text):
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "source.txt")
+        with open(source, "w") as f:
+            f.write(text)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                Assembler.assemble(source, os.path.join(directory, "out.txt"))
+        except Assembler.AssemblerError as e:
+            return str(e)
+    return None
+
+def single_pass_error(text):
+    try:
+        list(Assembler.assemble_stream(text.splitlines(True)))
+    except Assembler.AssemblerError as e:
+        return str(e)
+    return None
+
+class ErrorOrderTest(unittest.TestCase):
+    # The single-pass pipeline reports the same first error as assemble()
+
+    def check(self, text, expected):
+        self.assertEqual(two_pass_error(text), expected)
+        self.assertEqual(single_pass_error(text), expected)
+
+    def test_undefined_forward_label_before_syntax_error(self):
+        self.check("beq a1,a2,nowhere\naddi t1,t1,zz\nbeq zero,zero,0\n",
+                   "Error at line 1: Invalid immediate or label nowhere")
+
+    def test_label_error_before_earlier_encoding_error(self):
+        self.check("addi t1,t1,zz\n1bad: add t0,t0,t1\nbeq zero,zero,0\n",
+                   "Error at line 2: Label must start with a character")
+
+    def test_out_of_range_fixup_before_later_error(self):
+        source = "jal ra,far\n" + "add t0,t0,t1\n" * 300000 + "bogus t0\nfar: beq zero,zero,0\n"
+        self.check(source, "Error at line 1: Immediate 1200008 out of bounds for 21 bits")
+
+    def test_syntax_error_before_later_undefined_label(self):
+        self.check("addi t1,t1,zz\nbeq a1,a2,nowhere\nbeq zero,zero,0\n",
+                   "Error at line 1: Invalid immediate zz")
+
+def two_pass_words(text):
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "source.txt")
+        output = os.path.join(directory, "out.txt")
+        with open(source, "w") as f:
+            f.write(text)
+        with contextlib.redirect_stdout(io.StringIO()):
+            Assembler.assemble(source, output)
+        with open(output) as f:
+            return [int(line, 2) for line in f]
+
+class SinglePassOutputTest(unittest.TestCase):
+    # The single-pass pipeline writes the same words as assemble()
+
+    def check(self, text):
+        expected = two_pass_words(text)
+        self.assertEqual([word for _, word in Assembler.assemble_stream(text.splitlines(True))], expected)
+        self.assertEqual(Assembler.assemble_source(text).words, expected)
+        self.assertEqual(Assembler.assemble_diagnostics(text), [])
+
+    def test_label_on_the_last_line_resolves_a_fixup(self):
+        self.check("beq a0,zero,done\nbeq zero,zero,0\ndone:\n")
+
+    def test_label_only_line_resolves_a_fixup_midway(self):
+        self.check("jal ra,next\naddi t0,t0,1\nnext:\nadd t1,t1,t0\nbeq zero,zero,0\n")
+
+class OptimizerTest(unittest.TestCase):
+    # -O gives the words of the hand optimized source, and the reference
+    # simulator reaches the same final state with the plain and the
+    # optimized program
+
+    def check(self, source, expected):
+        source += "beq zero,zero,0\n"
+        optimized = Assembler.assemble_source(source, optimize=True)
+        self.assertEqual(optimized.words, Assembler.assemble_source(expected + "beq zero,zero,0\n").words)
+        equal, retired, retired_optimized = Simulator.compare_programs(Assembler.assemble_source(source), optimized)
+        self.assertTrue(equal)
+        self.assertLess(retired_optimized, retired)
+        return optimized
+
+    def test_dead_writes_to_zero(self):
+        self.check("add zero,t0,t1\naddi t0,zero,3\naddi zero,t0,5\nlui zero,4096\n",
+                   "addi t0,zero,3\n")
+
+    def test_addi_of_zero_to_itself(self):
+        self.check("addi t0,zero,4\naddi t0,t0,0\nadd t1,t0,t0\n",
+                   "addi t0,zero,4\nadd t1,t0,t0\n")
+
+    def test_adjacent_addi_pairs_fold(self):
+        self.check("addi t0,zero,4\naddi t0,t0,5\nadd t1,t0,t0\naddi t1,t1,-3\naddi t1,t1,1\n",
+                   "addi t0,zero,9\nadd t1,t0,t0\naddi t1,t1,-2\n")
+
+    def test_addi_pair_split_by_a_label_does_not_fold(self):
+        self.check("add zero,t0,t0\naddi t1,zero,4\nloop: addi t1,t1,-1\naddi t0,t0,1\nbne t1,zero,loop\n",
+                   "addi t1,zero,4\nloop: addi t1,t1,-1\naddi t0,t0,1\nbne t1,zero,loop\n")
+
+    def test_branch_to_the_next_instruction(self):
+        self.check("addi t0,zero,1\nbne t0,zero,next\nnext: addi t1,zero,2\njal zero,4\nadd t2,t1,t0\n",
+                   "addi t0,zero,1\naddi t1,zero,2\nadd t2,t1,t0\n")
+
+    def test_branch_threads_through_an_unconditional_jump(self):
+        self.check("addi t0,zero,1\nbne t0,zero,hop\naddi t1,zero,7\nhop: jal zero,end\naddi t2,zero,9\n"
+                   "end: addi t3,zero,3\n",
+                   "addi t0,zero,1\nbne t0,zero,end\naddi t1,zero,7\nhop: jal zero,end\naddi t2,zero,9\n"
+                   "end: addi t3,zero,3\n")
+
+    def test_label_on_a_removed_instruction_moves_to_the_next(self):
+        program = self.check("addi t0,zero,2\nloop: addi t0,t0,0\naddi t0,t0,-1\nbne t0,zero,loop\n",
+                             "addi t0,zero,2\nloop: addi t0,t0,-1\nbne t0,zero,loop\n")
+        self.assertEqual(program.labels["loop"], 4)
+
+class DiagnosticColumnTest(unittest.TestCase):
+    # The column points at the offending operand even when the same text
+    # appears earlier in the line
+
+    def diagnostic(self, line):
+        diagnostics = Assembler.assemble_diagnostics(line + "\nbeq zero,zero,0\n")
+        self.assertEqual(len(diagnostics), 1)
+        return diagnostics[0]
+
+    def test_immediate_matching_an_earlier_register(self):
+        self.assertEqual(self.diagnostic("addi t1,t1,t"),
+                         Assembler.Diagnostic(1, 12, "invalid-immediate", "Invalid immediate t"))
+
+    def test_offset_matching_the_end_of_a_register(self):
+        self.assertEqual(self.diagnostic("beq a1,a1,1").column, 11)
+
+    def test_memory_offset(self):
+        self.assertEqual(self.diagnostic("  lw t0,t0(sp)").column, 9)
+
+    def test_after_label_and_before_comment(self):
+        self.assertEqual(self.diagnostic("loop: jal t0,t0 # t0").column, 14)
+
+    def test_label_error(self):
+        self.assertEqual(self.diagnostic("1x: add t0,t0,t0").column, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+# Tests for the settings checks in evaluation_framework/benchmarks/generate.py
+# Run from the repository root: python3 -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "evaluation_framework", "benchmarks"))
+from generate import DEFAULT_SETTINGS, MAX_MEMORY_WORDS, checkSettings, generate
+
+class SettingsTest(unittest.TestCase):
+
+	def test_defaults_pass(self):
+		checkSettings(DEFAULT_SETTINGS)
+
+	def test_largest_data_segment_stays_in_the_reported_words(self):
+		program = generate(DEFAULT_SETTINGS._replace(memoryWords=MAX_MEMORY_WORDS), 1)
+		offsets = [int(line.split(",")[1].split("(")[0]) for line in program.splitlines()
+				   if line.split(": ")[-1].startswith(("lw ", "sw "))]
+		self.assertTrue(offsets)
+		self.assertLessEqual(max(offsets), 4 * (MAX_MEMORY_WORDS - 1))
+
+	def test_memory_beyond_the_simulator_rejected(self):
+		with self.assertRaisesRegex(ValueError, "memoryWords"):
+			generate(DEFAULT_SETTINGS._replace(memoryWords=MAX_MEMORY_WORDS + 1))
+		with self.assertRaisesRegex(ValueError, "memoryWords"):
+			generate(DEFAULT_SETTINGS._replace(memoryWords=-1))
+
+	def test_zero_trip_count_rejected(self):
+		with self.assertRaisesRegex(ValueError, "tripCount"):
+			generate(DEFAULT_SETTINGS._replace(tripCount=0))
+
+if __name__ == "__main__":
+	unittest.main()
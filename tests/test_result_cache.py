@@ -0,0 +1,70 @@
+# Tests for evaluation_framework/automatedTesting/src/ResultCache.py (the
+# same module ships in CO_Project_Allocated_jan30_2025/automatedTesting/src)
+# Run from the repository root: python3 -m unittest discover tests
+
+import os
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "evaluation_framework", "automatedTesting", "src"))
+from ResultCache import ResultCache
+from Runner import OK, Usage
+
+def writeFile(path, text):
+	with open(path, "w") as f:
+		f.write(text)
+	# step the mtime on, so the edit is seen even on a coarse clock
+	st = os.stat(path)
+	os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+
+class ScriptEditTest(unittest.TestCase):
+	# A cache that outlives an edit to the script under test, as in watch
+	# mode, must not serve the result of the old script
+
+	def setUp(self):
+		tempDir = tempfile.TemporaryDirectory()
+		self.addCleanup(tempDir.cleanup)
+		self.root = tempDir.name
+		os.mkdir(os.path.join(self.root, "SimpleSimulator"))
+		self.script = os.path.join(self.root, "SimpleSimulator", "Simulator.py")
+		self.helper = os.path.join(self.root, "SimpleSimulator", "isa.py")
+		writeFile(self.script, "print('v1')\n")
+		writeFile(self.helper, "X = 1\n")
+		self.input = os.path.join(self.root, "input.txt")
+		writeFile(self.input, "program\n")
+		self.output = os.path.join(self.root, "output.txt")
+		self.cache = ResultCache(os.path.join(self.root, "cache"))
+
+	def store(self, match):
+		writeFile(self.output, "trace\n")
+		key = self.cache.key(self.script, [self.input])
+		self.cache.store(key, OK, "", Usage(None, None, None, 0.1), match, [self.output])
+
+	def load(self):
+		return self.cache.load(self.cache.key(self.script, [self.input]), [self.output])
+
+	def test_unchanged_script_hits(self):
+		self.store(True)
+		self.assertEqual(self.load()[3], True)
+
+	def test_edited_script_misses(self):
+		self.store(True)
+		writeFile(self.script, "print('v2, now wrong')\n")
+		self.assertIsNone(self.load())
+		self.store(False)
+		self.assertEqual(self.load()[3], False)
+
+	def test_edited_module_next_to_script_misses(self):
+		self.store(True)
+		writeFile(self.helper, "X = 2\n")
+		self.assertIsNone(self.load())
+
+	def test_new_module_next_to_script_misses(self):
+		self.store(True)
+		writeFile(os.path.join(self.root, "SimpleSimulator", "helper.py"), "Y = 1\n")
+		self.assertIsNone(self.load())
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,63 @@
+# Tests for evaluation_framework/automatedTesting/src/Runner.py (the same
+# module ships in CO_Project_Allocated_jan30_2025/automatedTesting/src)
+# Run from the repository root: python3 -m unittest discover tests
+
+import os
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "evaluation_framework", "automatedTesting", "src"))
+from Runner import ScriptRunner
+
+SCRIPT = "import helper\nprint(helper.NAME)\n"
+
+def writeFile(path, text):
+	with open(path, "w") as f:
+		f.write(text)
+
+class ScriptRunnerModulesTest(unittest.TestCase):
+	# Modules a submission imports do not outlive its run
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.addCleanup(self.tempDir.cleanup)
+
+	def tool(self, name, helperName):
+		# A script in its own directory that prints the NAME of the helper.py
+		# next to it
+		directory = os.path.join(self.tempDir.name, name)
+		os.mkdir(directory)
+		writeFile(os.path.join(directory, "helper.py"), "NAME = %r\n" % helperName)
+		script = os.path.join(directory, name + ".py")
+		writeFile(script, SCRIPT)
+		return script
+
+	def test_same_named_helpers_do_not_collide(self):
+		assembler = ScriptRunner.load(self.tool("Assembler", "assembler helper"))
+		simulator = ScriptRunner.load(self.tool("Simulator", "simulator helper"))
+		self.assertEqual(assembler.run([]), (0, "assembler helper\n"))
+		self.assertEqual(simulator.run([]), (0, "simulator helper\n"))
+		self.assertEqual(assembler.run([]), (0, "assembler helper\n"))
+		self.assertNotIn("helper", sys.modules)
+
+	def test_edited_helper_is_reloaded(self):
+		script = self.tool("Assembler", "before")
+		runner = ScriptRunner.load(script)
+		self.assertEqual(runner.run([]), (0, "before\n"))
+		helper = os.path.join(os.path.dirname(script), "helper.py")
+		writeFile(helper, "NAME = 'after, edited'\n")
+		# make sure the edit is seen even on a coarse mtime clock
+		st = os.stat(helper)
+		os.utime(helper, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+		self.assertEqual(runner.run([]), (0, "after, edited\n"))
+
+	def test_installed_modules_stay_loaded(self):
+		runner = ScriptRunner.load(self.tool("Assembler", "x"))
+		import json
+		runner.run([])
+		self.assertIs(sys.modules["json"], json)
+
+if __name__ == "__main__":
+	unittest.main()
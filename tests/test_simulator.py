@@ -0,0 +1,56 @@
+# Tests for evaluation_framework/SimpleSimulator/Simulator.py
+# Run from the repository root: python3 -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "CO_Project_Allocated_jan30_2025", "SimpleAssembler"))
+sys.path.insert(0, os.path.join(REPO_DIR, "evaluation_framework", "automatedTesting", "src"))
+import Assembler
+from Runner import importScript
+
+Simulator = importScript("Simulator", os.path.join(REPO_DIR, "evaluation_framework", "SimpleSimulator", "Simulator.py"))
+
+def run(source):
+    registers, _, _ = Simulator.execute_program(Assembler.assemble_source(source + "beq zero,zero,0\n"))
+    return registers
+
+class BranchTest(unittest.TestCase):
+    # A taken branch moves the PC by its byte offset; beq is no different
+    # from the other branches
+
+    def test_taken_beq_skips_forward_by_its_offset(self):
+        registers = run("addi t0,zero,1\nbeq t0,t0,skip\naddi t1,zero,1\nskip: addi t2,zero,2\n")
+        self.assertEqual((registers["x6"], registers["x7"]), (0, 2))
+
+    def test_taken_beq_loops_backward_by_its_offset(self):
+        registers = run("addi t3,zero,3\nloop: addi t4,t4,1\naddi t3,t3,-1\n"
+                        "beq t3,zero,done\nbeq zero,zero,loop\ndone: addi t5,zero,5\n")
+        self.assertEqual((registers["x29"], registers["x30"]), (3, 5))
+
+    def test_untaken_beq_falls_through(self):
+        registers = run("addi t0,zero,1\nbeq t0,zero,skip\naddi t1,zero,1\nskip: addi t2,zero,2\n")
+        self.assertEqual((registers["x6"], registers["x7"]), (1, 2))
+
+class SetLessThanTest(unittest.TestCase):
+    # slt/slti compare registers and immediates as signed, sltu/sltiu as
+    # unsigned, whatever the sign of the operands
+
+    def setUp(self):
+        self.registers = run("addi t0,zero,-5\naddi t5,zero,3\n"
+                             "slti t1,t0,0\nslt t2,t0,zero\nslti t3,t0,-6\nslt t4,t0,t5\n"
+                             "sltiu t6,t0,3\nsltiu a0,zero,-1\nsltu a1,t0,t5\nsltu a2,t5,t0\n")
+
+    def value(self, name):
+        return self.registers["x%d" % Assembler.registers[name]]
+
+    def test_signed_compares(self):
+        self.assertEqual([self.value(r) for r in ("t1", "t2", "t3", "t4")], [1, 1, 0, 1])
+
+    def test_unsigned_compares(self):
+        self.assertEqual([self.value(r) for r in ("t6", "a0", "a1", "a2")], [0, 1, 0, 1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# Tests for evaluation_framework/automatedTesting/src/TraceDiff.py (the same
+# module ships in CO_Project_Allocated_jan30_2025/automatedTesting/src)
+# Run from the repository root: python3 -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "evaluation_framework", "automatedTesting", "src"))
+import TraceDiff
+from TraceDiff import compareTraces, formatComparison
+
+def row(pc, **registers):
+	values = [pc] + [registers.get("x" + str(i), 0) for i in range(32)]
+	return " ".join(str(value) for value in values) + "\n"
+
+def trace(rows, memory=None):
+	memory = memory or {}
+	return rows + ["0x%08X:%d\n" % (0x10000 + 4 * i, memory.get(i, 0)) for i in range(32)]
+
+def steps(count, wrongFrom=None, **wrong):
+	# count register lines; from step wrongFrom on the registers in wrong
+	# take those values
+	return [row(4 * step, **(wrong if wrongFrom is not None and step >= wrongFrom else {}))
+			for step in range(1, count + 1)]
+
+class CompareTracesTest(unittest.TestCase):
+
+	def compare(self, generated, expected):
+		return compareTraces(iter(generated), iter(expected))
+
+	def test_counts_cover_the_whole_trace(self):
+		# a divergence far longer than the context window and than a block
+		count = TraceDiff.BLOCK_ROWS * 2 + 500
+		comparison = self.compare(trace(steps(count, 10, x5=7)), trace(steps(count)))
+		self.assertEqual(comparison.firstStep, 10)
+		self.assertEqual(comparison.registers, ["x5"])
+		self.assertEqual(comparison.counts, {"x5": count - 9})
+		self.assertEqual([step for step, _, _ in comparison.context], list(range(7, 14)))
+		self.assertIn("Mismatched steps per register: x5=" + str(count - 9), formatComparison(comparison))
+
+	def test_counts_per_register(self):
+		generated = steps(20, 5, x1=1)
+		generated[14] = row(60, x1=1, x2=2)
+		comparison = self.compare(trace(generated), trace(steps(20)))
+		self.assertEqual(comparison.counts, {"x1": 16, "x2": 1})
+
+	def test_memory_is_reported_with_register_mismatches(self):
+		comparison = self.compare(trace(steps(8, 2, x3=1), {4: 9}), trace(steps(8)))
+		self.assertEqual(comparison.memory, [(0x10010, 9, 0)])
+		self.assertIn("Memory 0x00010010: got 9, expected 0", formatComparison(comparison))
+
+	def test_missing_steps(self):
+		comparison = self.compare(trace(steps(6)), trace(steps(9)))
+		self.assertEqual((comparison.firstStep, comparison.generatedSteps, comparison.expectedSteps), (7, 6, 9))
+		self.assertEqual(comparison.counts, {})
+		self.assertEqual(formatComparison(comparison)[0], "Trace has 6 steps, expected 9")
+
+	def test_matching_traces(self):
+		comparison = self.compare(trace(steps(5)), trace(steps(5)))
+		self.assertEqual((comparison.firstStep, comparison.counts, comparison.memory), (None, {}, []))
+
+	def test_counts_without_numpy(self):
+		saved = TraceDiff.np
+		TraceDiff.np = None
+		try:
+			self.test_counts_per_register()
+			self.test_counts_cover_the_whole_trace()
+		finally:
+			TraceDiff.np = saved
+
+if __name__ == "__main__":
+	unittest.main()